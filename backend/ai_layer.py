@@ -1,7 +1,9 @@
 import os
 import json
 import logging
-from openai import OpenAI
+
+import findings_parser
+from remediation import RemediationLayer
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -11,6 +13,8 @@ class AIInterpretationLayer:
     Level 4: AI Interpretation Layer.
     - Uses OpenAI to translate findings.
     - Focuses on simple language and concrete fix steps.
+    - The OpenAI client is created on first use, not at import.
+    - Falls back to the offline RemediationLayer text, never to placeholders.
     """
 
     SYSTEM_PROMPT = """
@@ -41,12 +45,39 @@ Output JSON Structure:
 
     def __init__(self, output_dir="results"):
         self.output_dir = output_dir
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self._client = None
+        self.remediation = RemediationLayer()
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return self._client
 
     def interpret(self, prioritized_findings):
+        """
+        Report with AI text. Findings the AI could not explain (or all of them, if
+        the OpenAI call fails) keep the offline remediation text.
+        """
         if not prioritized_findings:
             return []
 
+        try:
+            interpretations = self.explain(prioritized_findings)
+        except Exception as e:
+            logger.error(f"AI Interpretation failed: {str(e)}")
+            interpretations = []
+        final_report = self.merge(self.remediation.interpret(prioritized_findings), interpretations)
+
+        # Save output
+        output_file = os.path.join(self.output_dir, "final_report.json")
+        with open(output_file, 'w') as f:
+            findings_parser.dump(final_report, f, indent=True)
+        return final_report
+
+    def explain(self, prioritized_findings):
+        """One interpretation per finding, in input order. Raises if the OpenAI call fails."""
         # Prepare a minimal version of findings to save tokens and focus AI
         minimal_findings = []
         for f in prioritized_findings:
@@ -59,70 +90,44 @@ Output JSON Structure:
             })
 
         logger.info("Requesting AI interpretation from OpenAI...")
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": self.SYSTEM_PROMPT},
-                    {"role": "user", "content": json.dumps(minimal_findings)}
-                ],
-                response_format={"type": "json_object"}
-            )
-
-            # Extract the interpretation
-            ai_data = json.loads(response.choices[0].message.content)
-            # Response is expected to be {"findings": [...]} or similar depending on AI behavior
-            # We'll normalize it.
-            interpretations = ai_data.get("findings") if "findings" in ai_data else list(ai_data.values())[0] if isinstance(ai_data, dict) and len(ai_data) == 1 else []
-
-            # If the AI returns a list directly or in a different key, we handle it
-            if not interpretations and isinstance(ai_data, dict):
-                 # Try to find a list in the values
-                 for v in ai_data.values():
-                     if isinstance(v, list):
-                         interpretations = v
-                         break
-
-            # Zip interpretations back to findings
-            final_report = []
-            for i, f in enumerate(prioritized_findings):
-                interpretation = interpretations[i] if i < len(interpretations) else {
-                    "what_is_wrong": f.get("info", {}).get("name"),
-                    "why_it_matters": "Security risk detected.",
-                    "how_to_fix": "Refer to official documentation for " + f.get("template-id")
-                }
-
-                report_item = {
-                    "id": f.get("template-id"),
-                    "name": f.get("info", {}).get("name"),
-                    "severity": f.get("info", {}).get("severity"),
-                    "url": f.get("matched-at"),
-                    "interpretation": interpretation
-                }
-                final_report.append(report_item)
-
-            # Save output
-            output_file = os.path.join(self.output_dir, "final_report.json")
-            with open(output_file, 'w') as f:
-                json.dump(final_report, f, indent=2)
-
-            logger.info("AI interpretation complete.")
-            return final_report
-
-        except Exception as e:
-            logger.error(f"AI Interpretation failed: {str(e)}")
-            # Return basic info if AI fails
-            return [{
-                "id": f.get("template-id"),
-                "name": f.get("info", {}).get("name"),
-                "severity": f.get("info", {}).get("severity"),
-                "url": f.get("matched-at"),
-                "interpretation": {
-                    "what_is_wrong": "Automated finding: " + f.get("info", {}).get("name"),
-                    "why_it_matters": "Security risk.",
-                    "how_to_fix": "Check " + f.get("template-id")
-                }
-            } for f in prioritized_findings]
+        response = self.client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": self.SYSTEM_PROMPT},
+                {"role": "user", "content": json.dumps(minimal_findings)}
+            ],
+            response_format={"type": "json_object"}
+        )
+
+        # Extract the interpretation
+        ai_data = json.loads(response.choices[0].message.content)
+        # Response is expected to be {"findings": [...]} or similar depending on AI behavior
+        # We'll normalize it.
+        interpretations = ai_data.get("findings") if "findings" in ai_data else list(ai_data.values())[0] if isinstance(ai_data, dict) and len(ai_data) == 1 else []
+
+        # If the AI returns a list directly or in a different key, we handle it
+        if not interpretations and isinstance(ai_data, dict):
+             # Try to find a list in the values
+             for v in ai_data.values():
+                 if isinstance(v, list):
+                     interpretations = v
+                     break
+
+        logger.info("AI interpretation complete.")
+        return interpretations if isinstance(interpretations, list) else []
+
+    @staticmethod
+    def merge(report, interpretations):
+        """Apply AI interpretations onto report items (in order); items without one are left as they are"""
+        for item, interpretation in zip(report, interpretations):
+            if not isinstance(interpretation, dict) or not interpretation.get("what_is_wrong"):
+                continue
+            item["interpretation"] = {
+                **item.get("interpretation", {}),
+                **{k: interpretation[k] for k in ("what_is_wrong", "why_it_matters", "how_to_fix") if interpretation.get(k)}
+            }
+            item["interpretation_source"] = "ai"
+        return report
 
 if __name__ == "__main__":
     # Test run
@@ -1,5 +1,7 @@
 import os
 import logging
+import threading
+import time
 import requests
 from typing import Optional, Dict, Any
 from fastapi import Depends, HTTPException, status
@@ -20,27 +22,46 @@ security = HTTPBearer()
 
 # Cache for JWKS keys
 _jwks_cache: Dict[str, Any] = {}
+# Only one thread fetches JWKS on a cold cache; the session reuses the connection
+_jwks_lock = threading.Lock()
+_http = requests.Session()
+# After a failed fetch, requests get no keys until this time instead of queueing on the lock
+JWKS_RETRY_SECONDS = float(os.getenv("SNL_JWKS_RETRY_SECONDS", "30"))
+_jwks_retry_at = 0.0
 
 def get_jwks():
     """Fetch JWKS keys from Supabase"""
-    global _jwks_cache
     if _jwks_cache:
         return _jwks_cache
     
     if not SUPABASE_URL:
         logger.warning("SUPABASE_URL not set, cannot fetch JWKS")
         return {}
-    
+
+    if time.monotonic() < _jwks_retry_at:
+        return {}
+    with _jwks_lock:
+        if _jwks_cache:
+            return _jwks_cache
+        if time.monotonic() < _jwks_retry_at:
+            return {}  # the fetch this thread waited for failed
+        return _fetch_jwks()
+
+def _fetch_jwks():
+    global _jwks_cache, _jwks_retry_at
     try:
         jwks_url = f"{SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json"
-        response = requests.get(jwks_url, timeout=5)
+        response = _http.get(jwks_url, timeout=5)
         response.raise_for_status()
         data = response.json()
         _jwks_cache = {key['kid']: key for key in data.get('keys', [])}
         logger.info(f"Fetched {len(_jwks_cache)} keys from JWKS")
+        if not _jwks_cache:
+            _jwks_retry_at = time.monotonic() + JWKS_RETRY_SECONDS
         return _jwks_cache
     except Exception as e:
-        logger.error(f"Failed to fetch JWKS: {e}")
+        logger.error(f"Failed to fetch JWKS: {e}. Retrying in {JWKS_RETRY_SECONDS:g}s")
+        _jwks_retry_at = time.monotonic() + JWKS_RETRY_SECONDS
         return {}
 
 class User(BaseModel):
@@ -51,6 +72,8 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
     """
     Verifies the Supabase JWT token and returns the user object.
     Supports both HS256 (symmetric) and JWKS-based asymmetric algorithms (ES256, RS256).
+    Kept as a plain `def`: FastAPI runs sync dependencies in its threadpool,
+    so a cold JWKS fetch never blocks the event loop.
     """
     token = credentials.credentials
     
@@ -0,0 +1,79 @@
+"""
+Latency isolation check: one slow Supabase call must not stall unrelated endpoints.
+
+Runs the FastAPI app in-process with a locally signed HS256 token, a Supabase
+repository whose calls sleep, and a no-op scan job. While a POST /scan is stuck
+in the slow dependency, GET /scan/{scan_id} polls must still answer quickly.
+
+Usage:
+    cd backend && python bench/latency_isolation.py
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ["SUPABASE_JWT_SECRET"] = "bench-secret"
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+os.environ.pop("SUPABASE_URL", None)
+
+import httpx
+from jose import jwt
+
+import main
+from job_store import JobStore
+from data_access import ScanRepository
+
+SLOW_CALL_SECONDS = 2.0
+MAX_POLL_LATENCY = 0.25
+
+class SlowRepository(ScanRepository):
+    """Every call blocks like a Supabase request stuck on the network"""
+
+    def __init__(self):
+        super().__init__(client=object())
+
+    def create_scan(self, *args, **kwargs):
+        time.sleep(SLOW_CALL_SECONDS)
+
+    def update_scan(self, *args, **kwargs):
+        time.sleep(SLOW_CALL_SECONDS)
+
+async def run():
+    main.job_store = JobStore(os.path.join(tempfile.mkdtemp(), "scan_history.json"))
+    main.scans_repo = SlowRepository()
+    main.run_scan_job = lambda *args, **kwargs: None
+
+    token = jwt.encode({"sub": "bench-user", "aud": "authenticated"}, "bench-secret", algorithm="HS256")
+    headers = {"Authorization": f"Bearer {token}"}
+    main.job_store.create({"scan_id": "existing", "user_id": "bench-user", "status": "running"})
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        slow = asyncio.create_task(client.post("/scan", json={"url": "http://example.com"}, headers=headers))
+        await asyncio.sleep(0.1)  # let the submit reach the slow dependency
+
+        latencies = []
+        while not slow.done():
+            start = time.perf_counter()
+            response = await client.get("/scan/existing", params={"fields": "status"})
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.text
+            await asyncio.sleep(0.05)
+        submit = await slow
+
+    worst = max(latencies)
+    print(f"POST /scan (slow dependency): {submit.status_code}")
+    print(f"GET /scan polls during slow call: {len(latencies)}, worst latency {worst * 1000:.1f} ms")
+    if worst > MAX_POLL_LATENCY:
+        print(f"FAIL: poll latency exceeded {MAX_POLL_LATENCY * 1000:.0f} ms")
+        return 1
+    print("OK: unrelated endpoints stayed responsive")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run()))
@@ -0,0 +1,308 @@
+"""
+Load test for the API request path: auth, submit, poll, history, cancel, delete.
+
+Starts the app under uvicorn in a child process with a locally signed HS256 JWT
+secret, no Supabase, and a no-op scan executor (scans complete instantly with a
+small synthetic result), then drives it over real HTTP with closed-loop virtual
+users running a weighted mix of operations. Reports p50/p90/p99 latency and
+throughput per operation so changes to the request path can be compared.
+
+Usage:
+    cd backend && python bench/loadtest.py
+    python bench/loadtest.py --users 50 --duration 30 --mix submit=10,poll=50,list=25,cancel=5,delete=10
+    python bench/loadtest.py --json > before.json          # machine-readable report
+    python bench/loadtest.py --url http://host:8000 --secret <SUPABASE_JWT_SECRET>  # existing server
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import shutil
+import tempfile
+import subprocess
+from typing import Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+BENCH_SECRET = "bench-secret"
+DEFAULT_MIX = "submit=10,poll=50,list=25,cancel=5,delete=10"
+
+# -----------------
+# Server side (child process)
+# -----------------
+def serve(port: int, results_dir: str, seed_users: int, seed_scans: int):
+    """Run the app with the no-op executor; called in the child process"""
+    os.environ["SUPABASE_JWT_SECRET"] = BENCH_SECRET
+    os.environ["SNL_RESULTS_DIR"] = results_dir
+    os.environ["SNL_AI_ENRICHMENT"] = "0"
+    os.environ["SNL_RESUME_ON_STARTUP"] = "0"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+    os.environ["SUPABASE_URL"] = ""  # empty beats a developer .env (load_dotenv does not override)
+
+    import uvicorn
+    import main
+
+    def synthetic_result(target: str) -> dict:
+        return {
+            "summary": {
+                "target": target, "status": "completed", "total_endpoints": 42,
+                "raw_findings_count": 12, "top_issues_count": 3, "duration_seconds": 0.0
+            },
+            "findings": [{
+                "id": f"bench-template-{i}", "name": "Bench Finding", "severity": "low", "url": target,
+                "interpretation": {"what_is_wrong": "x" * 200, "why_it_matters": "y" * 200, "how_to_fix": "z" * 200}
+            } for i in range(3)]
+        }
+
+    def noop_scan_job(scan_id, target_url, mode="quick", user_id=None):
+        main.mark_running(scan_id, user_id)
+        main.job_store.set_result(scan_id, synthetic_result(str(target_url)), status="completed")
+        main.job_store.save()
+
+    def noop_batch_job(batch_id, targets, mode="quick", user_id=None):
+        for scan_id, url in targets:
+            noop_scan_job(scan_id, url, mode, user_id)
+
+    main.run_scan_job = noop_scan_job
+    main.run_batch_job = noop_batch_job
+
+    # Pre-existing history so list/poll work against a realistic index
+    for u in range(seed_users):
+        for i in range(seed_scans):
+            scan_id = f"seed-{u}-{i}"
+            main.create_job(scan_id, f"bench-user-{u}", f"http://seed-{i}.example", "quick")
+            main.job_store.set_result(scan_id, synthetic_result(f"http://seed-{i}.example"), status="completed")
+    main.job_store.save()
+
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning")
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(args) -> (subprocess.Popen, str):
+    port = free_port()
+    results_dir = tempfile.mkdtemp(prefix="snl-loadtest-")
+    cmd = [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port), "--results-dir", results_dir,
+           "--seed-users", str(args.users), "--seed-scans", str(args.seed_scans)]
+    # The server logs every request: a file never fills up and blocks it like a pipe would
+    log_path = os.path.join(results_dir, "server.log")
+    with open(log_path, 'wb') as log:
+        process = subprocess.Popen(cmd, cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=log)
+    process.results_dir = results_dir
+    process.log_path = log_path
+    return process, f"http://127.0.0.1:{port}"
+
+async def wait_ready(client, base_url: str, process: Optional[subprocess.Popen], timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process and process.poll() is not None:
+            with open(process.log_path, 'rb') as f:
+                raise RuntimeError("Server exited during startup:\n" + f.read().decode(errors="replace"))
+        try:
+            if (await client.get(base_url + "/")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not become ready")
+
+# -----------------
+# Client side
+# -----------------
+def parse_mix(mix: str) -> Dict[str, int]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ("submit", "poll", "list", "cancel", "delete"):
+            raise SystemExit(f"Unknown operation in --mix: {name}")
+        weights[name.strip()] = int(weight)
+    return weights
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+class VirtualUser:
+    """Closed-loop user: picks a weighted operation, waits for the response, repeats"""
+
+    def __init__(self, index: int, client, base_url: str, token: str, weights: Dict[str, int], stats: Dict[str, dict], think: float):
+        self.index = index
+        self.client = client
+        self.base_url = base_url
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.ops = list(weights)
+        self.weights = list(weights.values())
+        self.stats = stats
+        self.think = think
+        self.scan_ids: List[str] = []
+        self.etags: Dict[str, str] = {}
+        self.cursor: Optional[str] = None
+        self.rng = random.Random(index)
+
+    async def run(self, until: float):
+        while time.time() < until:
+            op = self.rng.choices(self.ops, self.weights)[0]
+            if op in ("poll", "cancel", "delete") and not self.scan_ids:
+                op = "submit"
+            start = time.perf_counter()
+            try:
+                response = await getattr(self, op)()
+                ok = response.status_code < 400
+            except Exception:
+                ok = False
+            self.record(op, time.perf_counter() - start, ok)
+            if self.think:
+                await asyncio.sleep(self.think)
+
+    def record(self, op: str, elapsed: float, ok: bool):
+        entry = self.stats.setdefault(op, {"latencies": [], "errors": 0})
+        entry["latencies"].append(elapsed)
+        if not ok:
+            entry["errors"] += 1
+
+    async def submit(self):
+        target = f"http://bench-{self.index}-{self.rng.randrange(10 ** 6)}.example"
+        response = await self.client.post(self.base_url + "/scan", json={"url": target}, headers=self.headers)
+        if response.status_code == 200:
+            self.scan_ids.append(response.json()["scan_id"])
+        return response
+
+    async def poll(self):
+        scan_id = self.rng.choice(self.scan_ids)
+        # Mostly status-only polls with conditional requests, like the dashboard
+        params = {"fields": "status,error"} if self.rng.random() < 0.8 else None
+        headers = dict(self.headers)
+        key = f"{scan_id}|{bool(params)}"
+        if key in self.etags:
+            headers["If-None-Match"] = self.etags[key]
+        response = await self.client.get(f"{self.base_url}/scan/{scan_id}", params=params, headers=headers)
+        if "etag" in response.headers:
+            self.etags[key] = response.headers["etag"]
+        return response
+
+    async def list(self):
+        params = {"limit": 20}
+        if self.cursor and self.rng.random() < 0.3:
+            params["cursor"] = self.cursor
+        response = await self.client.get(self.base_url + "/scans", params=params, headers=self.headers)
+        if response.status_code == 200:
+            self.cursor = response.json().get("next_cursor")
+        return response
+
+    async def cancel(self):
+        return await self.client.post(f"{self.base_url}/scan/{self.rng.choice(self.scan_ids)}/cancel", headers=self.headers)
+
+    async def delete(self):
+        scan_id = self.scan_ids.pop(self.rng.randrange(len(self.scan_ids)))
+        return await self.client.delete(f"{self.base_url}/scan/{scan_id}", headers=self.headers)
+
+def report(stats: Dict[str, dict], elapsed: float) -> dict:
+    result = {"duration_seconds": round(elapsed, 2), "operations": {}}
+    total = errors = 0
+    for op, entry in sorted(stats.items()):
+        latencies = sorted(entry["latencies"])
+        total += len(latencies)
+        errors += entry["errors"]
+        result["operations"][op] = {
+            "requests": len(latencies),
+            "errors": entry["errors"],
+            "throughput_rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p90_ms": round(percentile(latencies, 90) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0
+        }
+    all_latencies = sorted(l for entry in stats.values() for l in entry["latencies"])
+    result["total"] = {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(all_latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(all_latencies, 99) * 1000, 2)
+    }
+    return result
+
+def print_report(result: dict, args):
+    print(f"Users: {args.users}  Duration: {result['duration_seconds']}s  Mix: {args.mix}")
+    print(f"{'operation':<10}{'requests':>10}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for op, r in result["operations"].items():
+        print(f"{op:<10}{r['requests']:>10}{r['errors']:>8}{r['throughput_rps']:>9}{r['p50_ms']:>9}{r['p90_ms']:>9}{r['p99_ms']:>9}{r['max_ms']:>9}")
+    t = result["total"]
+    print(f"{'total':<10}{t['requests']:>10}{t['errors']:>8}{t['throughput_rps']:>9}{t['p50_ms']:>9}{'':>9}{t['p99_ms']:>9}")
+
+async def run(args) -> int:
+    import httpx
+    from jose import jwt
+
+    weights = parse_mix(args.mix)
+    process = None
+    base_url = args.url
+    if not base_url:
+        process, base_url = start_server(args)
+
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    try:
+        async with httpx.AsyncClient(timeout=30, limits=limits) as client:
+            await wait_ready(client, base_url, process)
+            stats: Dict[str, dict] = {}
+            users = [
+                VirtualUser(i, client, base_url,
+                            jwt.encode({"sub": f"bench-user-{i}", "aud": "authenticated"}, args.secret, algorithm="HS256"),
+                            weights, stats, args.think_ms / 1000)
+                for i in range(args.users)
+            ]
+            if args.warmup:
+                await asyncio.gather(*(u.run(time.time() + args.warmup) for u in users))
+                stats.clear()
+
+            start = time.time()
+            await asyncio.gather(*(u.run(start + args.duration) for u in users))
+            result = report(stats, time.time() - start)
+    finally:
+        if process:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+            shutil.rmtree(process.results_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result, args)
+    return 1 if result["total"]["errors"] and args.fail_on_errors else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the SNL API request path")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before the run")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="weighted operations, e.g. " + DEFAULT_MIX)
+    parser.add_argument("--think-ms", type=float, default=0, help="pause between a user's requests")
+    parser.add_argument("--seed-scans", type=int, default=200, help="history entries pre-created per user")
+    parser.add_argument("--url", help="drive an already running server instead of starting one")
+    parser.add_argument("--secret", default=BENCH_SECRET, help="HS256 secret the server verifies tokens with")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--fail-on-errors", action="store_true", help="exit 1 if any request failed")
+    # internal: child server process
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--results-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--seed-users", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.results_dir, args.seed_users, args.seed_scans)
+    else:
+        sys.exit(asyncio.run(run(args)))
@@ -0,0 +1,112 @@
+"""
+Findings parser micro-benchmark over the sample Nuclei outputs in bin/*.jsonl.
+
+The samples are repeated up to --lines lines and parsed as:
+  - jsonl: Nuclei -jsonl output (the normal path)
+  - text:  the same findings in Nuclei's plain-text format (the fallback grammar)
+with three implementations:
+  - legacy:   the previous inline loop (json.loads, then `import re` + re.search per line)
+  - json:     findings_parser with the standard library backend
+  - orjson:   findings_parser with orjson (skipped when it is not installed)
+Encoding is measured too: the history/report dump (json.dump indent=2 before).
+
+Usage:
+    cd backend && python bench/parse_findings.py [--lines N] [--repeat R]
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import findings_parser
+
+def legacy_parse(lines):
+    findings = []
+    for stdout_line in lines:
+        line = stdout_line.strip()
+        if not line: continue
+        try:
+            findings.append(json.loads(line))
+        except json.JSONDecodeError:
+            import re
+            pattern = r"\[(?P<id>[^\]]+)\] \[(?P<proto>[^\]]+)\] \[(?P<sev>[^\]]+)\] (?P<url>\S+)"
+            match = re.search(pattern, line)
+            if match:
+                findings.append({
+                    "template-id": match.group("id"),
+                    "type": match.group("proto"),
+                    "info": {"severity": match.group("sev")},
+                    "matched-at": match.group("url"),
+                    "full_line": line
+                })
+    return findings
+
+def parser_parse(lines):
+    return list(findings_parser.iter_findings(lines))
+
+def load_samples(limit: int):
+    lines = []
+    for path in sorted(glob.glob(os.path.join(BACKEND_DIR, "bin", "*.jsonl"))):
+        with open(path, 'r') as f:
+            lines.extend(line for line in f if line.strip())
+    if not lines:
+        raise SystemExit("No sample findings in bin/*.jsonl")
+    jsonl = (lines * (limit // len(lines) + 1))[:limit]
+
+    text = []
+    for line in jsonl:
+        finding = json.loads(line)
+        template = finding.get("template-id", "unknown")
+        if finding.get("matcher-name"):
+            template += ":" + finding["matcher-name"]
+        text.append(f"[{template}] [{finding.get('type', 'http')}] [{finding.get('info', {}).get('severity', 'info')}] {finding.get('matched-at', '')}\n")
+    return jsonl, text
+
+def best_of(repeat: int, fn, *args) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    jsonl, text = load_samples(args.lines)
+    size_mb = sum(len(line) for line in jsonl) / (1024 * 1024)
+    findings = [json.loads(line) for line in jsonl]
+    print(f"{len(jsonl)} lines ({size_mb:.1f} MB jsonl), best of {args.repeat}")
+
+    backends = {"json": None}
+    if findings_parser.orjson:
+        backends["orjson"] = findings_parser.orjson
+    original = findings_parser.orjson
+
+    print(f"{'input':<8}{'impl':<8}{'seconds':>10}{'lines/s':>12}{'speedup':>9}")
+    for name, lines in (("jsonl", jsonl), ("text", text)):
+        baseline = best_of(args.repeat, legacy_parse, lines)
+        print(f"{name:<8}{'legacy':<8}{baseline:>10.3f}{len(lines) / baseline:>12.0f}{1.0:>8.1f}x")
+        for backend, module in backends.items():
+            findings_parser.orjson = module
+            elapsed = best_of(args.repeat, parser_parse, lines)
+            print(f"{name:<8}{backend:<8}{elapsed:>10.3f}{len(lines) / elapsed:>12.0f}{baseline / elapsed:>8.1f}x")
+
+    baseline = best_of(args.repeat, lambda: json.dumps(findings, indent=2, default=str))
+    print(f"{'dump':<8}{'legacy':<8}{baseline:>10.3f}{'':>12}{1.0:>8.1f}x")
+    for backend, module in backends.items():
+        findings_parser.orjson = module
+        elapsed = best_of(args.repeat, findings_parser.dumps, findings)
+        print(f"{'dump':<8}{backend:<8}{elapsed:>10.3f}{'':>12}{baseline / elapsed:>8.1f}x")
+    findings_parser.orjson = original
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Startup benchmark: import time, time to first response and RSS.
+
+Builds a synthetic history (default 2000 scans x 10 findings) in a temporary
+results directory, then measures a cold worker in a fresh interpreter:
+  - import_s:          `import main` (app, layers, clients)
+  - first_request_s:   first GET /scan/{scan_id}?fields=status
+  - rss_mb:            resident memory after the first response
+
+Usage:
+    cd backend && python bench/startup.py [--scans N] [--findings M] [--legacy]
+
+--legacy writes the old history format (results inline) so the one-off
+migration cost can be measured as well.
+"""
+import os
+import sys
+import json
+import uuid
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import os, sys, time, json, asyncio
+t0 = time.perf_counter()
+sys.path.insert(0, {backend_dir!r})
+import main
+t_import = time.perf_counter() - t0
+
+import httpx
+
+async def first_request():
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        response = await client.get("/scan/{scan_id}", params={{"fields": "status"}})
+        assert response.status_code == 200, response.text
+        return time.perf_counter() - start
+
+t_first = asyncio.run(first_request())
+rss_kb = 0
+with open("/proc/self/status") as f:
+    for line in f:
+        if line.startswith("VmRSS:"):
+            rss_kb = int(line.split()[1])
+print(json.dumps({{"import_s": t_import, "first_request_s": t_first, "rss_mb": rss_kb / 1024}}))
+"""
+
+def build_history(results_dir: str, scans: int, findings: int, legacy: bool) -> str:
+    jobs = {}
+    base = datetime(2025, 1, 1)
+    for i in range(scans):
+        scan_id = str(uuid.uuid4())
+        result = {
+            "summary": {
+                "target": f"https://app{i % 50}.example.com/",
+                "status": "completed",
+                "total_endpoints": 120,
+                "raw_findings_count": findings * 4,
+                "top_issues_count": findings,
+                "duration_seconds": 312.5
+            },
+            "findings": [{
+                "id": "http-missing-security-headers",
+                "name": "HTTP Missing Security Headers",
+                "severity": "info",
+                "url": f"https://app{i % 50}.example.com/page/{n}",
+                "interpretation": {
+                    "what_is_wrong": "The response is missing recommended security headers. " * 3,
+                    "why_it_matters": "Browsers cannot apply protections such as HSTS or CSP. " * 3,
+                    "how_to_fix": "Set Strict-Transport-Security and Content-Security-Policy. " * 3
+                }
+            } for n in range(findings)]
+        }
+        job = {
+            "scan_id": scan_id,
+            "user_id": f"user-{i % 20}",
+            "target": result["summary"]["target"],
+            "mode": "quick",
+            "status": "completed",
+            "submitted_at": (base + timedelta(minutes=i)).isoformat(),
+            "error": None,
+            "version": 3
+        }
+        if legacy:
+            job["result"] = result
+        else:
+            job["summary"] = result["summary"]
+            job["has_result"] = True
+            scan_dir = os.path.join(results_dir, "scans", scan_id)
+            os.makedirs(scan_dir, exist_ok=True)
+            with open(os.path.join(scan_dir, "result.json"), "w") as f:
+                json.dump(result, f)
+        jobs[scan_id] = job
+
+    with open(os.path.join(results_dir, "scan_history.json"), "w") as f:
+        json.dump(jobs, f)
+    return scan_id
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scans", type=int, default=2000)
+    parser.add_argument("--findings", type=int, default=10)
+    parser.add_argument("--legacy", action="store_true", help="write the old inline-results history format")
+    args = parser.parse_args()
+
+    results_dir = tempfile.mkdtemp(prefix="snl-startup-")
+    scan_id = build_history(results_dir, args.scans, args.findings, args.legacy)
+
+    env = dict(os.environ)
+    env.update({
+        "SNL_RESULTS_DIR": results_dir,
+        "SUPABASE_JWT_SECRET": "bench-secret",
+        "OPENAI_API_KEY": env.get("OPENAI_API_KEY", "sk-bench"),
+    })
+    env.pop("SUPABASE_URL", None)
+
+    child = CHILD.format(backend_dir=BACKEND_DIR, scan_id=scan_id)
+    out = subprocess.run([sys.executable, "-c", child], env=env, cwd=results_dir,
+                         capture_output=True, text=True, check=True)
+    stats = json.loads(out.stdout.strip().splitlines()[-1])
+
+    history_mb = os.path.getsize(os.path.join(results_dir, "scan_history.json")) / (1024 * 1024)
+    print(f"History: {args.scans} scans x {args.findings} findings ({history_mb:.1f} MB index{', legacy' if args.legacy else ''})")
+    print(f"import main:        {stats['import_s'] * 1000:8.1f} ms")
+    print(f"first request:      {stats['first_request_s'] * 1000:8.1f} ms")
+    print(f"RSS after request:  {stats['rss_mb']:8.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import os
+import asyncio
+import logging
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bounded pool for blocking I/O (Supabase calls, history writes) issued from
+# async endpoints. Keeps a slow dependency from stalling the event loop while
+# capping how many blocking calls can be in flight at once.
+IO_MAX_WORKERS = int(os.getenv("SNL_IO_WORKERS", "8"))
+io_executor = ThreadPoolExecutor(max_workers=IO_MAX_WORKERS, thread_name_prefix="snl-io")
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking callable on the I/O pool and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor, functools.partial(fn, *args, **kwargs))
+
+class ScanRepository:
+    """
+    Data access for the Supabase `scans` / `scan_results` tables.
+    - One shared client, so HTTP connections are reused across calls.
+    - The client (and the supabase package) is only loaded on first use.
+    - Methods are blocking; async endpoints call them through run_blocking().
+    """
+
+    def __init__(self, url: Optional[str] = None, key: Optional[str] = None, client=None):
+        self.url = url
+        self.key = key
+        self._client = client
+        self._client_lock = threading.Lock()
+        if not self.enabled:
+            logger.warning("Supabase configuration missing. Database persistence disabled.")
+
+    @property
+    def enabled(self) -> bool:
+        return self._client is not None or bool(self.url and self.key)
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from supabase import create_client
+                    self._client = create_client(self.url, self.key)
+                    logger.info("Supabase client initialized.")
+        return self._client
+
+    def create_scan(self, scan_id: str, user_id: str, target_url: str, mode: str):
+        self.client.table("scans").insert({
+            "scan_id": scan_id,
+            "user_id": user_id,
+            "target_url": target_url,
+            "scan_mode": mode,
+            "status": "pending"
+        }).execute()
+
+    def create_scans(self, scans: List[Tuple[str, str, str, str]]):
+        """Insert several (scan_id, user_id, target_url, mode) rows in one request"""
+        self.client.table("scans").insert([{
+            "scan_id": scan_id,
+            "user_id": user_id,
+            "target_url": target_url,
+            "scan_mode": mode,
+            "status": "pending"
+        } for scan_id, user_id, target_url, mode in scans]).execute()
+
+    def update_scan(self, scan_id: str, **fields):
+        self.client.table("scans").update(fields).eq("scan_id", scan_id).execute()
+
+    def delete_scan(self, scan_id: str):
+        self.client.table("scans").delete().eq("scan_id", scan_id).execute()
+
+    def get_owner(self, scan_id: str) -> Optional[str]:
+        check = self.client.table("scans").select("user_id").eq("scan_id", scan_id).execute()
+        return check.data[0]["user_id"] if check.data else None
+
+    def list_scans(self, user_id: str, limit: int, before: Optional[Tuple[str, str]] = None,
+                   status: Optional[str] = None, target_contains: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        One page of a user's scans, newest first. `before` is the (started_at, scan_id)
+        of the last row served: keyset pagination on both columns, so rows sharing a
+        started_at (batch inserts) are not skipped at a page boundary.
+        """
+        query = self.client.table("scans") \
+            .select("scan_id,status,target_url,started_at,error_message") \
+            .eq("user_id", user_id)
+        if status:
+            query = query.eq("status", status)
+        if target_contains:
+            # Match the text literally: escape LIKE wildcards, drop PostgREST's * wildcard
+            text = target_contains.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_").replace("*", "")
+            query = query.ilike("target_url", f"%{text}%")
+        if before:
+            started_at, scan_id = before
+            query = query.or_(f'started_at.lt."{started_at}",and(started_at.eq."{started_at}",scan_id.lt."{scan_id}")')
+        return query.order("started_at", desc=True).order("scan_id", desc=True).limit(limit).execute().data
+
+    def insert_results(self, scan_id: str, findings: List[Dict[str, Any]]):
+        """Insert all report rows for a scan in a single request"""
+        if not findings:
+            return
+        self.client.table("scan_results").insert([{
+            "scan_id": scan_id,
+            "severity": f.get("severity"),
+            "title": f.get("name"),
+            "description": f.get("interpretation", {}).get("what_is_wrong"),
+            "remediation": f.get("interpretation", {}).get("how_to_fix"),
+            "raw_json": f
+        } for f in findings]).execute()
+
+    def replace_results(self, scan_id: str, findings: List[Dict[str, Any]]):
+        """Swap a scan's report rows (e.g. after AI enrichment rewrote the text)"""
+        self.client.table("scan_results").delete().eq("scan_id", scan_id).execute()
+        self.insert_results(scan_id, findings)
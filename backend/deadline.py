@@ -0,0 +1,43 @@
+import time
+import logging
+from typing import Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class ScanDeadline:
+    """
+    Overall time budget for one scan, handed out to stages as they start.
+    - Each stage gets a share of what is left, so time one stage doesn't use goes to the next.
+    - A reserve is kept back for filtering and reporting.
+    - Stages that run out of time stop and keep their partial output.
+    """
+
+    MODE_SECONDS = {"quick": 900, "deep": 2700}
+    # Share of the remaining time (after the reserve) a stage may use
+    STAGE_SHARES = {"discovery": 0.4, "detection": 1.0}
+    REPORT_RESERVE_SECONDS = 30
+    MIN_STAGE_SECONDS = 10
+
+    def __init__(self, seconds: float, started_at: Optional[float] = None):
+        self.seconds = seconds
+        self.started_at = started_at or time.time()
+
+    @classmethod
+    def for_job(cls, job: dict) -> "ScanDeadline":
+        """
+        The job's requested deadline, or the default for its mode, counted from its start
+        (or from `deadline_start` when the job's clock does not start with it, as in batches).
+        """
+        seconds = job.get("deadline_seconds") or cls.MODE_SECONDS.get(job.get("mode", "quick"), cls.MODE_SECONDS["deep"])
+        return cls(seconds, job.get("deadline_start") or job.get("start_time"))
+
+    def remaining(self) -> float:
+        return max(0.0, self.started_at + self.seconds - time.time())
+
+    def allot(self, stage: str) -> int:
+        """Seconds the stage may run; 0 when there is no time left for it"""
+        available = self.remaining() - self.REPORT_RESERVE_SECONDS
+        if available < self.MIN_STAGE_SECONDS:
+            return 0
+        return max(self.MIN_STAGE_SECONDS, int(available * self.STAGE_SHARES.get(stage, 1.0)))
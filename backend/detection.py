@@ -1,7 +1,13 @@
 import subprocess
-import json
 import os
+import re
+import time
+import shutil
+import threading
 import logging
+from typing import Callable, Dict
+
+import findings_parser
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -49,12 +55,34 @@ class DetectionLayer:
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
 
-    def scan(self, target_list_file: str, mode: str = "quick"):
+    DEFAULT_TIMEOUT_SECONDS = 900
+    # Time Nuclei gets to exit (and write its resume file) after SIGTERM
+    STOP_GRACE_SECONDS = 10
+
+    # Nuclei logs this when it is interrupted (SIGINT/SIGTERM) and saves its progress
+    RESUME_FILE_PATTERN = re.compile(r"Creating resume file: (\S+)")
+    # Nuclei logs this once templates are parsed and requests start
+    TEMPLATES_LOADED_MARKER = "Templates loaded for"
+    TEMPLATE_LOAD_POLL_SECONDS = 0.25
+
+    def scan(self, target_list_file: str, mode: str = "quick", output_dir: str = None, resume: bool = False, timeout: int = None,
+             tuning: Dict[str, int] = None, on_process: Callable[[subprocess.Popen], None] = None):
         """
         Runs Nuclei on the list of endpoints discovered by Katana.
+        The list may span several targets (batch scans); Nuclei loads templates once per call.
+        With resume=True, an earlier interrupted run in output_dir is continued: Nuclei's
+        resume file is used when it left one, and findings already written are kept.
+        After `timeout` seconds Nuclei is stopped and the findings so far are returned
+        (stats["timed_out"] is set). `tuning` sets Nuclei's -c / -bs / -hbs.
+        stats["timings"] has epoch times of start, template load, first finding and exit.
+        on_process(process) gets the started Nuclei process, so the caller can stop it.
         """
-        output_file = os.path.join(self.output_dir, "raw_findings.json")
+        timeout = timeout or self.DEFAULT_TIMEOUT_SECONDS
+        output_dir = output_dir or self.output_dir
+        output_file = os.path.join(output_dir, "raw_findings.json")
         output_abs_path = os.path.abspath(output_file)
+        partial_file = os.path.join(output_dir, "raw_findings.partial.json")
+        stderr_path = os.path.join(output_dir, "nuclei_stderr.log")
         
         # Resolve nuclei path and templates path (Management Requirement Step 1)
         base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -76,11 +104,16 @@ class DetectionLayer:
             "-timeout", "30",  # Increased per-request timeout
             "-dast", # Required for generic vulnerabilities (SQLi, XSS)
             "-silent", # Display findings only (standard output)
+            "-jsonl", # JSON findings carry template metadata (description, remediation, reference)
             "-o", output_abs_path,
             "-stats",
             "-stats-interval", "5"  # Less frequent stats to reduce noise
         ]
 
+        for flag in ("c", "bs", "hbs"):
+            if (tuning or {}).get(flag):
+                cmd.extend([f"-{flag}", str(tuning[flag])])
+
         # Select template dirs based on mode
         selected_dirs = self.QUICK_TEMPLATE_DIRS if mode == "quick" else self.DEEP_TEMPLATE_DIRS
         
@@ -96,6 +129,19 @@ class DetectionLayer:
             else:
                 logger.warning(f"Template directory missing: {full_t_path}")
 
+        previous = []
+        if resume:
+            resume_file = self.find_resume_file(stderr_path)
+            if resume_file:
+                logger.info(f"Resuming Nuclei from {resume_file}")
+                cmd.extend(["-resume", resume_file])
+            # Keep findings of the interrupted run(s); they survive another interruption
+            if os.path.exists(output_file):
+                with open(output_file, 'r') as src, open(partial_file, 'a') as dst:
+                    shutil.copyfileobj(src, dst)
+            previous = self.read_findings(partial_file)
+            logger.info(f"Keeping {len(previous)} findings from the interrupted run")
+
         # Requirement 7: Abort if 0 templates
         if active_templates_count == 0:
             logger.error(f"CRITICAL: {mode.capitalize()} scan aborted. 0 Nuclei templates activated.")
@@ -107,10 +153,12 @@ class DetectionLayer:
         logger.info(f"--- DETECTION START ---")
         logger.info(f"Nuclei Binary (ABSOLUTE): {nuclei_abs_path}")
         logger.info(f"Templates Root (ABSOLUTE): {templates_abs_path}")
-        logger.info(f"Detection timeout set to 900 seconds (15 minutes)...")
+        logger.info(f"Detection timeout set to {timeout} seconds...")
         logger.info(f"Executing: {' '.join(cmd)}")
 
-        stats = {"templates_loaded": 0, "requests_sent": 0}
+        stats = {"templates_loaded": 0, "requests_sent": 0, "timed_out": False}
+        timings = {"started": time.time(), "templates_loaded": None, "first_finding": None, "finished": None}
+        stats["timings"] = timings
         findings = []
 
         try:
@@ -118,46 +166,44 @@ class DetectionLayer:
             if os.path.exists(output_file):
                 os.remove(output_file)
 
-            # Nuclei writes stats to stderr, findings to stdout/file
-            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            # Nuclei writes stats to stderr, findings to stdout/file.
+            # stderr goes to a file so a resume-file notice outlives this process.
+            with open(stderr_path, 'w') as stderr_file:
+                process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file, text=True)
+            if on_process:
+                on_process(process)
+            threading.Thread(target=self._watch_template_load, args=(stderr_path, process, timings), daemon=True).start()
+
+            # The stdout loop below only ends when Nuclei exits, so the timeout is enforced here
+            timed_out = threading.Event()
+            def on_timeout():
+                timed_out.set()
+                self._stop(process)
+            watchdog = threading.Timer(timeout, on_timeout)
+            watchdog.daemon = True
+            watchdog.start()
             try:
                 # Capture output for line-by-line parsing as it arrives (Robustness)
                 # We still expect -o to work, but we parse stdout too
-                for stdout_line in iter(process.stdout.readline, ""):
-                    line = stdout_line.strip()
-                    if not line: continue
-                    
-                    # Try to parse as JSON first (Requirement Step 2)
-                    try:
-                        finding = json.loads(line)
-                        findings.append(finding)
-                    except json.JSONDecodeError:
-                        # Fallback: Robust Parser for standard nuclei output format
-                        # Example: [sqli-error-based] [http] [critical] http://...
-                        import re
-                        pattern = r"\[(?P<id>[^\]]+)\] \[(?P<proto>[^\]]+)\] \[(?P<sev>[^\]]+)\] (?P<url>\S+)"
-                        match = re.search(pattern, line)
-                        if match:
-                            finding = {
-                                "template-id": match.group("id"),
-                                "type": match.group("proto"),
-                                "info": {"severity": match.group("sev")},
-                                "matched-at": match.group("url"),
-                                "full_line": line # Keep for raw context
-                            }
-                            findings.append(finding)
-
-                stdout, stderr = process.communicate(timeout=900) # 15 minute timeout for thorough scans
-            except subprocess.TimeoutExpired:
-                logger.error("Nuclei execution reached 15 minute timeout. Terminating...")
-                process.kill()
-                stdout, stderr = process.communicate()
+                # JSON first (Requirement Step 2), then the plain-text fallback
+                for finding in findings_parser.iter_findings(iter(process.stdout.readline, "")):
+                    if not findings:
+                        timings["first_finding"] = time.time()
+                    findings.append(finding)
+
+                process.communicate()
+            finally:
+                watchdog.cancel()
+                timings["finished"] = time.time()
+
+            if timed_out.is_set():
+                stats["timed_out"] = True
                 # Still return any findings collected so far
-                logger.info(f"Partial scan completed. Collected {len(findings)} findings before timeout.")
+                logger.warning(f"Nuclei execution reached {timeout} second timeout. Collected {len(findings)} findings before timeout.")
             
             # Parse stats from stderr (Management Requirement Step 1.3)
-            if stderr:
-                for line in stderr.splitlines():
+            with open(stderr_path, 'r') as f:
+                for line in f:
                     # Format: [INF] Templates loaded for current scan: 1234
                     if "Templates loaded for" in line:
                         try:
@@ -179,24 +225,15 @@ class DetectionLayer:
             logger.info(f"Requests Sent: {stats['requests_sent']}")
 
             # If findings list is still empty, check the output file as a last resort
-            if not findings and os.path.exists(output_file):
-                with open(output_file, 'r') as f:
-                    for line_num, line in enumerate(f, 1):
-                        clean_line = line.strip()
-                        if not clean_line: continue
-                        try:
-                            findings.append(json.loads(clean_line))
-                        except json.JSONDecodeError:
-                            # Fallback parser for file content too
-                            import re
-                            pattern = r"\[(?P<id>[^\]]+)\] \[(?P<proto>[^\]]+)\] \[(?P<sev>[^\]]+)\] (?P<url>\S+)"
-                            match = re.search(pattern, clean_line)
-                            if match:
-                                findings.append({
-                                    "template-id": match.group("id"),
-                                    "info": {"severity": match.group("sev")},
-                                    "matched-at": match.group("url")
-                                })
+            if not findings:
+                findings = findings_parser.read_findings(output_file)
+
+            if resume:
+                findings = previous + findings
+                with open(output_file, 'w') as f:
+                    findings_parser.write_findings(findings, f)
+                if os.path.exists(partial_file):
+                    os.remove(partial_file)
 
             logger.info(f"Detection complete. Found {len(findings)} raw findings.")
             return findings, stats
@@ -206,6 +243,53 @@ class DetectionLayer:
             return [], stats
 
 
+    @classmethod
+    def _stop(cls, process: subprocess.Popen):
+        """SIGTERM first so Nuclei saves its resume state, then kill"""
+        if process.poll() is not None:
+            return
+        process.terminate()
+        try:
+            process.wait(timeout=cls.STOP_GRACE_SECONDS)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    @classmethod
+    def _watch_template_load(cls, stderr_path: str, process: subprocess.Popen, timings: Dict[str, float]):
+        """Note when Nuclei reports its templates loaded (stderr goes to a file, so poll it)"""
+        offset, tail = 0, ""
+        while process.poll() is None:
+            try:
+                with open(stderr_path, 'r', errors='replace') as f:
+                    f.seek(offset)
+                    chunk = f.read()
+                    offset = f.tell()
+            except OSError:
+                return
+            if cls.TEMPLATES_LOADED_MARKER in tail + chunk:
+                timings["templates_loaded"] = time.time()
+                return
+            tail = chunk[-len(cls.TEMPLATES_LOADED_MARKER):] or tail
+            time.sleep(cls.TEMPLATE_LOAD_POLL_SECONDS)
+
+    @classmethod
+    def find_resume_file(cls, stderr_path: str):
+        """Resume file announced by an interrupted Nuclei run, if it still exists"""
+        if not os.path.exists(stderr_path):
+            return None
+        resume_file = None
+        with open(stderr_path, 'r', errors='replace') as f:
+            for line in f:
+                match = cls.RESUME_FILE_PATTERN.search(line)
+                if match:
+                    resume_file = match.group(1)
+        return resume_file if resume_file and os.path.exists(resume_file) else None
+
+    @staticmethod
+    def read_findings(path: str):
+        """JSONL findings file -> list (missing file -> [])"""
+        return findings_parser.read_findings(path)
+
 if __name__ == "__main__":
     # Test run
     detection = DetectionLayer()
@@ -1,112 +1,204 @@
 import subprocess
+import threading
+import time
 import json
 import os
 import logging
+from typing import Callable, List, Optional
+from pydantic import BaseModel, Field
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Static assets are never useful Nuclei targets
+DEFAULT_EXCLUDED_EXTENSIONS = ["png", "jpg", "jpeg", "gif", "svg", "ico", "css", "woff", "woff2", "ttf", "eot", "mp4", "webp"]
+
+class CrawlBudget(BaseModel):
+    """Per-scan limits for the Katana crawl"""
+    max_urls: int = Field(1000, ge=1, le=20000)       # stop once this many unique endpoints are found
+    max_seconds: int = Field(600, ge=10, le=3600)     # wall-time budget for the crawl
+    depth: int = Field(2, ge=1, le=5)
+    concurrency: Optional[int] = Field(None, ge=1, le=100)  # Katana -c (auto-tuned when unset)
+    parallelism: Optional[int] = Field(None, ge=1, le=50)   # Katana -p (auto-tuned when unset)
+    scope: Optional[List[str]] = None                 # in-scope URL regexes (-cs)
+    out_of_scope: Optional[List[str]] = None          # out-of-scope URL regexes (-cos)
+    exclude_extensions: List[str] = Field(default_factory=lambda: list(DEFAULT_EXCLUDED_EXTENSIONS))
+
+    @classmethod
+    def for_mode(cls, mode: str) -> "CrawlBudget":
+        if mode == "quick":
+            return cls(max_urls=500, max_seconds=300)
+        return cls()
+
 class DiscoveryLayer:
     """
     Level 1: Attack Surface Discovery using Katana.
-    - Crawl depth: 2
+    - Crawl depth: 2 (configurable per scan via CrawlBudget)
     - JS parsing: enabled
     - Form discovery: enabled
     - No payloads/POST execution
+    - Output is parsed as it streams; hitting a budget stops Katana and keeps what was found.
     """
 
+    # Extra time Katana gets to stop on its own (-ct) before it is terminated
+    STOP_GRACE_SECONDS = 15
+
     def __init__(self, output_dir="results"):
         self.output_dir = output_dir
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
 
-    def discover(self, target_url: str):
-        output_file = os.path.join(self.output_dir, "endpoints.json")
-        
+    def discover(self, target_url: str, output_dir: str = None, budget: CrawlBudget = None,
+                 on_process: Callable[[subprocess.Popen], None] = None):
+        """
+        Crawl target_url within the budget. Writes endpoints.json / endpoints.txt into
+        output_dir (defaults to the layer's output dir) so concurrent scans don't collide.
+        on_process(process) gets the started Katana process, so the caller can stop it.
+        Returns (unique_urls, crawl_stats).
+        """
+        output_dir = output_dir or self.output_dir
+        budget = budget or CrawlBudget()
+        output_file = os.path.join(output_dir, "endpoints.json")
+
         # Resolve katana path
         base_dir = os.path.dirname(os.path.abspath(__file__))
         katana_bin = os.path.join(base_dir, "bin", "katana")
         if not os.path.exists(katana_bin):
              katana_bin = "katana" # Fallback to path if not in local bin
-        
+
         katana_abs_path = os.path.abspath(katana_bin)
 
         # Katana command configuration
         cmd = [
             katana_abs_path,
             "-u", target_url,
-            "-d", "2",
+            "-d", str(budget.depth),
             "-jc",
             "-fx",
             "-silent",
             "-jsonl",
+            "-ct", f"{budget.max_seconds}s",
             "-o", output_file
         ]
+        if budget.concurrency:
+            cmd.extend(["-c", str(budget.concurrency)])
+        if budget.parallelism:
+            cmd.extend(["-p", str(budget.parallelism)])
+        for pattern in budget.scope or []:
+            cmd.extend(["-cs", pattern])
+        for pattern in budget.out_of_scope or []:
+            cmd.extend(["-cos", pattern])
+        if budget.exclude_extensions:
+            cmd.extend(["-ef", ",".join(budget.exclude_extensions)])
 
         logger.info(f"--- DISCOVERY START ---")
         logger.info(f"Target: {target_url}")
         logger.info(f"Katana Binary: {katana_abs_path}")
         logger.info(f"Executing: {' '.join(cmd)}")
-        
-        try:
-            # clear previous results
-            if os.path.exists(output_file):
-                os.remove(output_file)
-
-            logger.info(f"Discovery timeout set to 600 seconds...")
-            
-            # Execution with increased timeout for slow networks
-            result = subprocess.run(cmd, check=True, capture_output=True, timeout=600)
-
-            # Read JSONL output
-            endpoints = []
-            if os.path.exists(output_file):
-                with open(output_file, 'r') as f:
-                    for line in f:
-                        if not line.strip(): continue
-                        try:
-                            data = json.loads(line.strip())
-                            # Katana jsonl usually has 'request' object with 'endpoint' field
-                            if "request" in data and "endpoint" in data["request"]:
-                                url = data["request"]["endpoint"]
-                                endpoints.append(url)
-                            elif "url" in data:
-                                endpoints.append(data["url"])
-                        except json.JSONDecodeError:
-                            continue
-            
-            # Remove duplicates
-            unique_urls = list(set(endpoints))
-            
-            # Check for 0 URLs (Management Requirement Step 3)
-            if not unique_urls:
-                logger.error("CRITICAL: No attack surface discovered by Katana.")
-                # Return standardized error message
-                raise Exception("No attack surface discovered")
-
-            logger.info(f"Discovery complete. Found {len(unique_urls)} unique URLs.")
-            
-            # Log sample of discovered endpoints (Management Requirement Step 3)
-            sample_count = min(5, len(unique_urls))
-            logger.info(f"Sample discovered endpoints: {unique_urls[:sample_count]}")
-
-            # Create simple text file for Nuclei
-            txt_output = os.path.join(self.output_dir, "endpoints.txt")
-            with open(txt_output, 'w') as f:
-                for url in unique_urls:
-                    f.write(url + "\n")
-
-            return unique_urls
 
-        except subprocess.TimeoutExpired:
-             logger.error("Katana execution timed out after 600 seconds. Target may be unreachable or slow.")
-             raise Exception("Discovery timed out - target may be unreachable or responding slowly")
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Katana failed: {e.stderr.decode() if e.stderr else 'Unknown error'}")
-            raise Exception(f"Discovery failed: {e.stderr.decode() if e.stderr else 'Unknown error'}")
+        # clear previous results
+        if os.path.exists(output_file):
+            os.remove(output_file)
+
+        logger.info(f"Crawl budget: {budget.max_urls} URLs / {budget.max_seconds} seconds")
+
+        unique_urls = {}  # insertion-ordered set
+        stop_reason = None
+        start = time.time()
+        stderr_path = os.path.join(output_dir, "katana_stderr.log")
+
+        try:
+            with open(stderr_path, 'w') as stderr_file:
+                process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file, text=True)
         except FileNotFoundError:
             logger.error(f"Katana binary not found at {katana_abs_path}")
             raise Exception("Katana binary missing")
+        if on_process:
+            on_process(process)
+
+        # Hard backstop in case Katana ignores its own crawl duration
+        timed_out = threading.Event()
+        def on_deadline():
+            timed_out.set()
+            self._stop(process)
+        watchdog = threading.Timer(budget.max_seconds + self.STOP_GRACE_SECONDS, on_deadline)
+        watchdog.daemon = True
+        watchdog.start()
+
+        try:
+            # Read JSONL output as Katana produces it
+            for line in iter(process.stdout.readline, ""):
+                url = self._parse_endpoint(line)
+                if url and url not in unique_urls:
+                    unique_urls[url] = None
+                    if len(unique_urls) >= budget.max_urls:
+                        stop_reason = "max_urls"
+                        logger.info(f"Crawl budget reached: {budget.max_urls} URLs. Stopping Katana.")
+                        self._stop(process)
+                        break
+            process.wait()
+        finally:
+            watchdog.cancel()
+            process.stdout.close()
+
+        elapsed = round(time.time() - start, 2)
+        if stop_reason is None and (timed_out.is_set() or elapsed >= budget.max_seconds):
+            stop_reason = "max_seconds"
+            logger.warning(f"Crawl time budget ({budget.max_seconds}s) used up. Keeping {len(unique_urls)} URLs found so far.")
+
+        if process.returncode not in (0, None) and stop_reason is None and not unique_urls:
+            with open(stderr_path, 'r') as f:
+                stderr = f.read().strip()
+            logger.error(f"Katana failed: {stderr or 'Unknown error'}")
+            raise Exception(f"Discovery failed: {stderr or 'Unknown error'}")
+
+        urls = list(unique_urls)
+
+        # Check for 0 URLs (Management Requirement Step 3)
+        if not urls:
+            logger.error("CRITICAL: No attack surface discovered by Katana.")
+            # Return standardized error message
+            raise Exception("No attack surface discovered")
+
+        logger.info(f"Discovery complete. Found {len(urls)} unique URLs in {elapsed}s.")
+
+        # Log sample of discovered endpoints (Management Requirement Step 3)
+        sample_count = min(5, len(urls))
+        logger.info(f"Sample discovered endpoints: {urls[:sample_count]}")
+
+        # Create simple text file for Nuclei
+        txt_output = os.path.join(output_dir, "endpoints.txt")
+        with open(txt_output, 'w') as f:
+            for url in urls:
+                f.write(url + "\n")
+
+        crawl_stats = {"urls": len(urls), "elapsed_seconds": elapsed, "stop_reason": stop_reason}
+        return urls, crawl_stats
+
+    @staticmethod
+    def _parse_endpoint(line: str) -> Optional[str]:
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError:
+            return None
+        # Katana jsonl usually has 'request' object with 'endpoint' field
+        if "request" in data and "endpoint" in data["request"]:
+            return data["request"]["endpoint"]
+        return data.get("url")
+
+    @staticmethod
+    def _stop(process: subprocess.Popen):
+        """Terminate Katana, escalating to kill if it doesn't exit"""
+        if process.poll() is not None:
+            return
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
 
 if __name__ == "__main__":
     # Test run
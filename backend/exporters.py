@@ -0,0 +1,207 @@
+import io
+import csv
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+import findings_parser
+from findings_index import fingerprint
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# format -> (media type, file extension)
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "sarif": ("application/sarif+json", "sarif")
+}
+
+CSV_COLUMNS = [
+    "template_id", "matcher_name", "name", "severity", "type", "host", "matched_at",
+    "description", "why_it_matters", "remediation", "references", "tags",
+    "extracted_results", "timestamp", "source", "fingerprint"
+]
+
+SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+SARIF_LEVELS = {"critical": "error", "high": "error", "medium": "warning", "low": "note", "info": "note"}
+# GitHub code scanning ranks alerts by this (0-10)
+SARIF_SECURITY_SEVERITY = {"critical": "9.5", "high": "8.0", "medium": "5.5", "low": "3.0", "info": "0.0"}
+
+CHUNK_SIZE = 64 * 1024
+
+Chunk = Union[str, bytes]
+
+# -----------------
+# Flat records (one shape for raw and prioritized findings)
+# -----------------
+def _as_list(value: Any) -> List[str]:
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [v.strip() for v in value.replace(",", " ").split() if v.strip()]
+    return [str(v) for v in value]
+
+def raw_record(finding: Dict[str, Any]) -> Dict[str, Any]:
+    """Export record of a raw Nuclei (or passive check) finding"""
+    info = finding.get("info") or {}
+    key, details = fingerprint(finding)
+    return {
+        "template_id": finding.get("template-id"),
+        "matcher_name": finding.get("matcher-name"),
+        "name": info.get("name") or finding.get("template-id"),
+        "severity": details["severity"],
+        "type": finding.get("type"),
+        "host": details["host"],
+        "matched_at": finding.get("matched-at") or finding.get("host"),
+        "description": (info.get("description") or "").strip() or None,
+        "why_it_matters": None,
+        "remediation": (info.get("remediation") or "").strip() or None,
+        "references": _as_list(info.get("reference")),
+        "tags": _as_list(info.get("tags")),
+        "extracted_results": _as_list(finding.get("extracted-results")),
+        "timestamp": finding.get("timestamp"),
+        "source": finding.get("source", "nuclei"),
+        "fingerprint": key
+    }
+
+def report_record(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Export record of a prioritized report item (id, name, severity, url, interpretation)"""
+    interpretation = item.get("interpretation") or {}
+    key, details = fingerprint({"template-id": item.get("id"), "matched-at": item.get("url")})
+    return {
+        "template_id": item.get("id"),
+        "matcher_name": None,
+        "name": item.get("name"),
+        "severity": (item.get("severity") or "unknown").lower(),
+        "type": None,
+        "host": details["host"],
+        "matched_at": item.get("url"),
+        "description": interpretation.get("what_is_wrong"),
+        "why_it_matters": interpretation.get("why_it_matters"),
+        "remediation": interpretation.get("how_to_fix"),
+        "references": _as_list(interpretation.get("references")),
+        "tags": [],
+        "extracted_results": [],
+        "timestamp": None,
+        "source": item.get("interpretation_source"),
+        "fingerprint": key
+    }
+
+# -----------------
+# Writers (generators; nothing is buffered beyond one chunk)
+# -----------------
+def ndjson_lines(lines: Iterable[bytes]) -> Iterator[bytes]:
+    """Stored raw findings are already JSONL: pass the object lines through untouched"""
+    for line in lines:
+        line = line.strip()
+        if line[:1] == b"{":
+            yield line + b"\n"
+
+def ndjson(items: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    for item in items:
+        yield findings_parser.dumps(item) + "\n"
+
+def _csv_cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        value = "; ".join(value)
+    value = str(value)
+    # Cells opened in a spreadsheet must not run as formulas (URLs and payloads come from the target)
+    if value[:1] in ("=", "+", "-", "@", "\t", "\r"):
+        value = "'" + value
+    return value
+
+def csv_rows(records: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for record in records:
+        writer.writerow([_csv_cell(record.get(column)) for column in CSV_COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()  # header only, when there were no records
+
+def sarif(records: Iterable[Dict[str, Any]], run_id: Optional[str] = None) -> Iterator[str]:
+    """
+    SARIF 2.1.0 log with one run. Results are streamed first and the rules
+    (one per template) are written after them, so memory grows with the
+    number of distinct templates, not with the number of findings.
+    """
+    yield f'{{"version":"2.1.0","$schema":"{SARIF_SCHEMA}","runs":[{{"results":['
+    rules: Dict[str, Dict[str, Any]] = {}
+    first = True
+    for record in records:
+        rule_id = record["template_id"] or "unknown"
+        if rule_id not in rules:
+            rules[rule_id] = _sarif_rule(rule_id, record)
+        result = {
+            "ruleId": rule_id,
+            "level": SARIF_LEVELS.get(record["severity"], "warning"),
+            "message": {"text": f"{record['name']} at {record['matched_at']}" if record["matched_at"] else record["name"] or rule_id},
+            "locations": [{"physicalLocation": {"artifactLocation": {"uri": record["matched_at"] or record["host"] or ""}}}],
+            "partialFingerprints": {"snlFinding/v1": record["fingerprint"]},
+            "properties": {k: record[k] for k in ("severity", "matcher_name", "extracted_results", "source") if record.get(k)}
+        }
+        yield ("" if first else ",") + findings_parser.dumps(result)
+        first = False
+
+    tool = {"driver": {"name": "SNL (Security Next Layer)", "rules": list(rules.values())}}
+    tail = {"tool": tool}
+    if run_id:
+        tail["automationDetails"] = {"id": run_id}
+    yield "]," + findings_parser.dumps(tail)[1:] + "]}"
+
+def _sarif_rule(rule_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    rule = {
+        "id": rule_id,
+        "name": record["name"] or rule_id,
+        "shortDescription": {"text": record["name"] or rule_id},
+        "properties": {"tags": record["tags"] + ["security"], "security-severity": SARIF_SECURITY_SEVERITY.get(record["severity"], "5.0")}
+    }
+    if record.get("description"):
+        rule["fullDescription"] = {"text": record["description"]}
+    if record.get("remediation"):
+        rule["help"] = {"text": record["remediation"]}
+    if record["references"]:
+        rule["helpUri"] = record["references"][0]
+    return rule
+
+def chunked(parts: Iterable[Chunk], size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Join small writer output into ~size byte chunks for the response"""
+    buffer: List[bytes] = []
+    buffered = 0
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode()
+        buffer.append(part)
+        buffered += len(part)
+        if buffered >= size:
+            yield b"".join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+def export(fmt: str, raw_lines: Optional[Iterable[bytes]] = None, report: Optional[Iterable[Dict[str, Any]]] = None,
+           run_id: Optional[str] = None) -> Iterator[bytes]:
+    """
+    Stream findings in `fmt` (ndjson, csv or sarif) from either the stored raw
+    findings lines (JSONL) or the prioritized report items.
+    """
+    if raw_lines is not None:
+        if fmt == "ndjson":
+            return chunked(ndjson_lines(raw_lines))
+        records = (raw_record(f) for f in findings_parser.iter_findings(raw_lines))
+    else:
+        if fmt == "ndjson":
+            return chunked(ndjson(report))
+        records = (report_record(item) for item in report)
+    if fmt == "csv":
+        return chunked(csv_rows(records))
+    return chunked(sarif(records, run_id))
+
+if __name__ == "__main__":
+    # Test run
+    # print(b"".join(export("sarif", report=[{"id": "x", "name": "X", "severity": "high", "url": "https://example.com"}])).decode())
+    pass
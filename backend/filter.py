@@ -1,7 +1,8 @@
-import json
 import os
 import logging
 
+import findings_parser
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -99,7 +100,7 @@ class FilteringLayer:
         # Save output
         output_file = os.path.join(self.output_dir, "prioritized_findings.json")
         with open(output_file, 'w') as f:
-            json.dump(prioritized, f, indent=2)
+            findings_parser.dump(prioritized, f, indent=True)
 
         logger.info(f"Prioritization complete. Selected {len(prioritized)} issues out of {len(raw_findings)} raw findings.")
         return prioritized
@@ -0,0 +1,209 @@
+import os
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Set, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl
+
+import findings_parser
+from singleflight import normalize_target, DEFAULT_PORTS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SEVERITY_ORDER = {"critical": 0, "high": 1, "medium": 2, "low": 3, "info": 4, "unknown": 5}
+
+def normalize_location(location: str) -> str:
+    """
+    Stable form of a matched-at location:
+    lower-case scheme/host, no default port, numeric path segments as {n},
+    query parameter names only (values change between scans), no fragment.
+    Non-URL locations (host:port of network/TLS templates) are only lower-cased.
+    """
+    location = (location or "").strip()
+    if "://" not in location:
+        return location.lower()
+    parts = urlsplit(location)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = "/".join("{n}" if segment.isdigit() else segment for segment in (parts.path or "/").split("/"))
+    query = "&".join(sorted({name for name, _ in parse_qsl(parts.query, keep_blank_values=True)}))
+    return urlunsplit((scheme, host, path, query, ""))
+
+def fingerprint(finding: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """(fingerprint, details) of a raw finding: template (+ matcher), host and normalised location"""
+    info = finding.get("info") or {}
+    template = finding.get("template-id") or "unknown"
+    if finding.get("matcher-name"):
+        template = f"{template}:{finding['matcher-name']}"
+    location = normalize_location(finding.get("matched-at") or finding.get("host") or "")
+    host = (urlsplit(location if "://" in location else "//" + location).hostname or "").lower()
+    key = hashlib.sha1(f"{template}|{host}|{location}".encode()).hexdigest()[:20]
+    return key, {
+        "fingerprint": key,
+        "template": template,
+        "host": host,
+        "location": location,
+        "name": info.get("name") or template,
+        "severity": (info.get("severity") or "unknown").lower()
+    }
+
+class _TargetHistory:
+    """Scans of one target in completion order, stored as fingerprint deltas"""
+
+    def __init__(self):
+        self.scans: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.deltas: List[Tuple[List[str], List[str]]] = []  # (added, removed) vs the previous scan
+        self.counts: List[int] = []
+        self.current: Set[str] = set()          # fingerprints of the latest scan
+        self.first_seen: Dict[str, int] = {}    # fingerprint -> position it first appeared at
+        self.details: Dict[str, Dict[str, Any]] = {}
+
+    def apply(self, entry: Dict[str, Any]):
+        position = len(self.scans)
+        self.scans.append(entry["scan_id"])
+        self.positions[entry["scan_id"]] = position
+        self.deltas.append((entry["added"], entry["removed"]))
+        self.counts.append(entry["count"])
+        self.details.update(entry.get("details", {}))
+        for fp in entry["added"]:
+            self.first_seen.setdefault(fp, position)
+        self.current.difference_update(entry["removed"])
+        self.current.update(entry["added"])
+
+class FindingIndex:
+    """
+    Stable finding fingerprints per (user, target), for "what changed since last scan".
+    - Each completed scan is stored as the fingerprints added/removed since the
+      previous scan of the target, appended to one JSONL file per target.
+    - Recording a scan costs O(its findings); a diff between two scans composes
+      only the deltas between them, so it never touches the rest of the history.
+    - new: absent from the base scan and never seen before it. regressed: absent
+      from the base scan but seen in an earlier one. fixed: gone since the base scan.
+    - Deleted scans stay in the chain so later diffs remain composable.
+    """
+
+    INITIALIZED_MARKER = ".indexed"
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self._targets: Dict[str, _TargetHistory] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(user_id: Optional[str], target: str) -> str:
+        return f"{user_id or ''}|{normalize_target(target)}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.index_dir, hashlib.sha1(key.encode()).hexdigest()[:20] + ".jsonl")
+
+    def _history(self, key: str) -> _TargetHistory:
+        """Target history, replayed from its file on first use (caller holds the lock)"""
+        history = self._targets.get(key)
+        if history is None:
+            history = _TargetHistory()
+            try:
+                with open(self._path(key), 'r') as f:
+                    for line in f:
+                        if line.strip():
+                            history.apply(findings_parser.loads(line))
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to read findings index for {key}: {e}")
+            self._targets[key] = history
+        return history
+
+    def record(self, user_id: Optional[str], target: str, scan_id: str, findings: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Add a completed scan after the target's latest one. Returns its new/fixed counts vs that scan."""
+        fingerprints = dict(fingerprint(f) for f in findings)
+        key = self.key(user_id, target)
+        with self._lock:
+            history = self._history(key)
+            if scan_id in history.positions:
+                return {"new": 0, "fixed": 0}  # already indexed (resumed or backfilled)
+            added = sorted(fingerprints.keys() - history.current)
+            removed = sorted(history.current - fingerprints.keys())
+            entry = {
+                "scan_id": scan_id,
+                "added": added,
+                "removed": removed,
+                "count": len(fingerprints),
+                # Details are stored once, the first time a fingerprint is seen
+                "details": {fp: fingerprints[fp] for fp in added if fp not in history.details}
+            }
+            os.makedirs(self.index_dir, exist_ok=True)
+            with open(self._path(key), 'a') as f:
+                f.write(findings_parser.dumps(entry) + "\n")
+            history.apply(entry)
+        return {"new": len(added), "fixed": len(removed)}
+
+    def previous(self, user_id: Optional[str], target: str, scan_id: str) -> Optional[str]:
+        """The scan of the same target indexed just before this one"""
+        with self._lock:
+            history = self._history(self.key(user_id, target))
+            position = history.positions.get(scan_id)
+            return history.scans[position - 1] if position else None
+
+    def diff(self, user_id: Optional[str], target: str, base_id: str, head_id: str) -> Dict[str, Any]:
+        """
+        Issues that changed between two indexed scans of a target (the earlier one is the base).
+        Raises KeyError if either scan is not indexed for this target.
+        """
+        with self._lock:
+            history = self._history(self.key(user_id, target))
+            for scan_id in (base_id, head_id):
+                if scan_id not in history.positions:
+                    raise KeyError(scan_id)
+            base, head = sorted((history.positions[base_id], history.positions[head_id]))
+
+            added: Set[str] = set()
+            removed: Set[str] = set()
+            for position in range(base + 1, head + 1):
+                for fp in history.deltas[position][0]:
+                    if fp in removed:
+                        removed.discard(fp)
+                    else:
+                        added.add(fp)
+                for fp in history.deltas[position][1]:
+                    if fp in added:
+                        added.discard(fp)
+                    else:
+                        removed.add(fp)
+
+            regressed = {fp for fp in added if history.first_seen.get(fp, base) < base}
+            return {
+                "target": normalize_target(target),
+                "base_scan_id": history.scans[base],
+                "head_scan_id": history.scans[head],
+                "new": self._describe(history, added - regressed),
+                "fixed": self._describe(history, removed),
+                "regressed": self._describe(history, regressed),
+                "unchanged_count": history.counts[head] - len(added)
+            }
+
+    @staticmethod
+    def _describe(history: _TargetHistory, fingerprints: Set[str]) -> List[Dict[str, Any]]:
+        items = [history.details.get(fp, {"fingerprint": fp}) for fp in fingerprints]
+        items.sort(key=lambda d: (SEVERITY_ORDER.get(d.get("severity"), 5), d.get("template", ""), d.get("location", "")))
+        return items
+
+    # -----------------
+    # One-time backfill of scans completed before the index existed
+    # -----------------
+    @property
+    def initialized(self) -> bool:
+        return os.path.exists(os.path.join(self.index_dir, self.INITIALIZED_MARKER))
+
+    def mark_initialized(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        open(os.path.join(self.index_dir, self.INITIALIZED_MARKER), 'w').close()
+
+if __name__ == "__main__":
+    # Test run
+    # index = FindingIndex("results/findings_index")
+    # index.record("user", "https://example.com", "scan-1", [{"template-id": "x", "matched-at": "https://example.com/a?id=1"}])
+    pass
@@ -0,0 +1,109 @@
+import os
+import re
+import json
+import logging
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional, Union
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Optional faster JSON backend; SNL_JSON_BACKEND=json forces the standard library
+try:
+    import orjson
+except ImportError:
+    orjson = None
+if os.getenv("SNL_JSON_BACKEND", "auto") == "json":
+    orjson = None
+
+BACKEND = "orjson" if orjson else "json"
+
+# Plain-text Nuclei output (no -jsonl, or a line the JSON writer mangled):
+# [template-id:matcher-name] [protocol] [severity] matched-at ["extracted", ...]
+TEXT_LINE_PATTERN = re.compile(
+    r"\[(?P<id>[^\]:]+)(?::(?P<matcher>[^\]]+))?\] \[(?P<proto>[^\]]+)\] \[(?P<sev>[^\]]+)\] (?P<url>\S+)"
+)
+
+Line = Union[str, bytes]
+
+# -----------------
+# JSON backend
+# -----------------
+def loads(data: Line) -> Any:
+    """Decode JSON (str or bytes). Raises ValueError on invalid input."""
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps(obj: Any, indent: bool = False) -> str:
+    """Encode JSON; values the encoder does not know are written as str()"""
+    if orjson:
+        try:
+            return orjson.dumps(obj, default=str, option=orjson.OPT_INDENT_2 if indent else 0).decode()
+        except TypeError:
+            pass  # e.g. non-str keys or >64-bit ints; the standard library handles these
+    return json.dumps(obj, indent=2 if indent else None, default=str)
+
+def load(f: IO) -> Any:
+    return loads(f.read())
+
+def dump(obj: Any, f: IO, indent: bool = False):
+    f.write(dumps(obj, indent))
+
+# -----------------
+# Findings (Nuclei JSONL with a text fallback)
+# -----------------
+def parse_line(line: Line) -> Optional[Dict[str, Any]]:
+    """One line of Nuclei output -> finding, or None for blank/unrecognised lines"""
+    line = line.strip()
+    if not line:
+        return None
+    # Only object lines can be JSON findings; skip the failed decode for text lines
+    if line[:1] in ("{", b"{"):
+        try:
+            finding = loads(line)
+            if isinstance(finding, dict):
+                return finding
+        except ValueError:
+            pass
+
+    # Fallback: Robust Parser for standard nuclei output format
+    # Example: [sqli-error-based] [http] [critical] http://...
+    if isinstance(line, bytes):
+        line = line.decode("utf-8", errors="replace")
+    match = TEXT_LINE_PATTERN.search(line)
+    if not match:
+        return None
+    finding = {
+        "template-id": match.group("id"),
+        "type": match.group("proto"),
+        "info": {"severity": match.group("sev")},
+        "matched-at": match.group("url"),
+        "full_line": line  # Keep for raw context
+    }
+    if match.group("matcher"):
+        finding["matcher-name"] = match.group("matcher")
+    return finding
+
+def iter_findings(lines: Iterable[Line]) -> Iterator[Dict[str, Any]]:
+    """Stream findings from lines as they arrive (process stdout, open file, ...)"""
+    for line in lines:
+        finding = parse_line(line)
+        if finding is not None:
+            yield finding
+
+def read_findings(path: str) -> List[Dict[str, Any]]:
+    """JSONL findings file -> list (missing file -> [])"""
+    if not os.path.exists(path):
+        return []
+    with open(path, 'rb') as f:
+        return list(iter_findings(f))
+
+def write_findings(findings: Iterable[Dict[str, Any]], f: IO):
+    """Append findings to a text file as JSONL"""
+    for finding in findings:
+        f.write(dumps(finding) + "\n")
+
+if __name__ == "__main__":
+    # Test run
+    # print(parse_line("[http-missing-security-headers:csp] [http] [info] http://testphp.vulnweb.com/"))
+    pass
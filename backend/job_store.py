@@ -0,0 +1,442 @@
+import os
+import json
+import atexit
+import base64
+import bisect
+import shutil
+import tarfile
+import tempfile
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List, Tuple
+
+import findings_parser
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class JobStore:
+    """
+    Scan job records (In-Memory + File Persistence).
+    - Every mutation goes through create/update/delete.
+    - Each record carries a monotonically increasing `version`
+      which backs the ETag returned by GET /scan/{scan_id}.
+    - A per-user index sorted by `submitted_at` keeps history listing
+      O(page size) instead of O(all jobs); per-user totals (scans, completed,
+      issues, duration) are kept up to date with it.
+    - save() only schedules a write; a single writer thread coalesces
+      bursts of saves so callers (including the event loop) never block on disk.
+    - The history file is an index of job metadata + summaries only. Full results
+      live in per-scan files and are read on demand (with a small LRU cache).
+      Nothing is read from disk until the store is first used.
+    - Retention (age, count per user, total bytes) moves old per-scan
+      directories into compressed archives that remain readable on demand.
+    """
+
+    RESULT_CACHE_SIZE = 32
+
+    def __init__(self, history_file: str, scans_dir: Optional[str] = None):
+        self.history_file = history_file
+        self.scans_dir = scans_dir or os.path.join(os.path.dirname(history_file), "scans")
+        self.archive_dir = os.path.join(os.path.dirname(self.scans_dir), "archive")
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._result_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # user_id -> sorted [(submitted_at, scan_id)], oldest first
+        self._by_user: Dict[str, List[Tuple[str, str]]] = {}
+        # user_id -> running sums over the user's jobs, see totals_for_user()
+        self._totals: Dict[str, Dict[str, float]] = {}
+        self._dirty = threading.Event()
+        self._write_lock = threading.Lock()  # one history write at a time, in snapshot order
+        self._writer: Optional[threading.Thread] = None
+
+    def load(self):
+        """(Re)load the scan history index from file, replacing what is in memory"""
+        with self._lock:
+            try:
+                if os.path.exists(self.history_file):
+                    with open(self.history_file, 'rb') as f:
+                        self.jobs = findings_parser.load(f)
+                    logger.info(f"Loaded {len(self.jobs)} scans from history")
+            except Exception as e:
+                logger.error(f"Failed to load history: {e}")
+                self.jobs = {}
+            migrated = self._migrate_inline_results()
+            self._rebuild_index()
+            self._loaded = True
+        if migrated:
+            logger.info(f"Moved {migrated} inline results to per-scan files")
+            self.save()
+
+    def ensure_loaded(self):
+        """Load the history once; a no-op after the first load (explicit or on demand)"""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.load()
+
+    def save(self):
+        """Schedule a history write on the background writer"""
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._writer_loop, name="snl-history-writer", daemon=True)
+                self._writer.start()
+                atexit.register(self.flush)
+        self._dirty.set()
+
+    def flush(self):
+        """
+        Write scan history to file now. Only the serialisation holds the store lock;
+        the file write does not block create/update/list callers.
+        """
+        if not self._loaded:
+            return
+        with self._write_lock:
+            self._dirty.clear()
+            try:
+                with self._lock:
+                    snapshot = findings_parser.dumps(self.jobs)
+                os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
+                tmp_file = self.history_file + ".tmp"
+                with open(tmp_file, 'w') as f:
+                    f.write(snapshot)
+                os.replace(tmp_file, self.history_file)
+            except Exception as e:
+                logger.error(f"Failed to save history: {e}")
+
+    def _writer_loop(self):
+        while True:
+            self._dirty.wait()
+            self.flush()
+
+    def __contains__(self, scan_id: str) -> bool:
+        self.ensure_loaded()
+        return scan_id in self.jobs
+
+    def get(self, scan_id: str) -> Optional[Dict[str, Any]]:
+        self.ensure_loaded()
+        return self.jobs.get(scan_id)
+
+    def values(self) -> List[Dict[str, Any]]:
+        self.ensure_loaded()
+        with self._lock:
+            return list(self.jobs.values())
+
+    def create(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        self.ensure_loaded()
+        with self._lock:
+            record["version"] = 1
+            self.jobs[record["scan_id"]] = record
+            self._index_add(record)
+            self._count(record, 1)
+        return record
+
+    def update(self, scan_id: str, **fields) -> Optional[Dict[str, Any]]:
+        """Apply field changes to a job and bump its version"""
+        self.ensure_loaded()
+        with self._lock:
+            job = self.jobs.get(scan_id)
+            if job is None:
+                return None
+            reindex = "user_id" in fields or "submitted_at" in fields
+            retotal = reindex or "status" in fields or "summary" in fields
+            if reindex:
+                self._index_remove(job)
+            if retotal:
+                self._count(job, -1)
+            job.update(fields)
+            if reindex:
+                self._index_add(job)
+            if retotal:
+                self._count(job, 1)
+            job["version"] = job.get("version", 0) + 1
+            return job
+
+    def delete(self, scan_id: str) -> Optional[Dict[str, Any]]:
+        """Remove a job and its per-scan files"""
+        self.ensure_loaded()
+        with self._lock:
+            job = self.jobs.pop(scan_id, None)
+            if job is not None:
+                self._index_remove(job)
+                self._count(job, -1)
+            self._result_cache.pop(scan_id, None)
+        shutil.rmtree(self.scan_dir(scan_id), ignore_errors=True)
+        if os.path.exists(self.archive_path(scan_id)):
+            os.remove(self.archive_path(scan_id))
+        return job
+
+    # -----------------
+    # Per-scan results
+    # -----------------
+    def scan_dir(self, scan_id: str) -> str:
+        return os.path.join(self.scans_dir, scan_id)
+
+    def archive_path(self, scan_id: str) -> str:
+        return os.path.join(self.archive_dir, f"{scan_id}.tar.gz")
+
+    @contextmanager
+    def open_scan_file(self, scan_id: str, name: str):
+        """
+        Open a per-scan file for binary reading, from the scan directory or,
+        once evicted, streamed out of the scan's archive.
+        Raises FileNotFoundError if neither has it.
+        """
+        job = self.get(scan_id) or {}
+        path = os.path.join(self.scan_dir(scan_id), name)
+        if not job.get("archived") and os.path.exists(path):
+            with open(path, 'rb') as f:
+                yield f
+            return
+        with tarfile.open(self.archive_path(scan_id), "r:gz") as tar:
+            try:
+                member = tar.extractfile(name)
+            except KeyError:
+                member = None
+            if member is None:
+                raise FileNotFoundError(f"{name} not found for scan {scan_id}")
+            yield member
+
+    def set_result(self, scan_id: str, result: Dict[str, Any], **fields) -> Optional[Dict[str, Any]]:
+        """Persist a full result to its per-scan file; the index keeps only the summary"""
+        self._write_result(scan_id, result)
+        with self._lock:
+            self._cache_result(scan_id, result)
+        return self.update(
+            scan_id,
+            summary=result.get("summary"),
+            has_result=True,
+            disk_bytes=self._scan_bytes(scan_id),
+            **fields
+        )
+
+    def get_result(self, scan_id: str) -> Optional[Dict[str, Any]]:
+        """Full result for a scan, read from disk on a cache miss"""
+        job = self.get(scan_id)
+        if job is None or not job.get("has_result"):
+            return None
+        with self._lock:
+            if scan_id in self._result_cache:
+                self._result_cache.move_to_end(scan_id)
+                return self._result_cache[scan_id]
+        try:
+            with self.open_scan_file(scan_id, "result.json") as f:
+                result = findings_parser.load(f)
+        except Exception as e:
+            logger.error(f"Failed to read result for {scan_id}: {e}")
+            return None
+        with self._lock:
+            self._cache_result(scan_id, result)
+        return result
+
+    def _write_result(self, scan_id: str, result: Dict[str, Any]):
+        """Write result.json via a temp file so readers never see a partial one"""
+        scan_dir = self.scan_dir(scan_id)
+        os.makedirs(scan_dir, exist_ok=True)
+        # Unique name: AI enrichment may rewrite the result while another write is in flight
+        fd, tmp_file = tempfile.mkstemp(prefix="result.json.", suffix=".tmp", dir=scan_dir)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                findings_parser.dump(result, f)
+            os.replace(tmp_file, os.path.join(scan_dir, "result.json"))
+        except BaseException:
+            try:
+                os.remove(tmp_file)
+            except OSError:
+                pass
+            raise
+
+    def _cache_result(self, scan_id: str, result: Dict[str, Any]):
+        self._result_cache[scan_id] = result
+        self._result_cache.move_to_end(scan_id)
+        while len(self._result_cache) > self.RESULT_CACHE_SIZE:
+            self._result_cache.popitem(last=False)
+
+    def _scan_bytes(self, scan_id: str) -> int:
+        try:
+            return sum(e.stat().st_size for e in os.scandir(self.scan_dir(scan_id)) if e.is_file())
+        except FileNotFoundError:
+            return 0
+
+    # -----------------
+    # Retention & archiving
+    # -----------------
+    def archive(self, scan_id: str) -> bool:
+        """Compress a scan's directory into archive/<scan_id>.tar.gz and drop the hot copy"""
+        src = self.scan_dir(scan_id)
+        if not os.path.isdir(src):
+            return False
+        os.makedirs(self.archive_dir, exist_ok=True)
+        tmp_file = self.archive_path(scan_id) + ".tmp"
+        try:
+            with tarfile.open(tmp_file, "w:gz") as tar:
+                for name in sorted(os.listdir(src)):
+                    tar.add(os.path.join(src, name), arcname=name)
+            os.replace(tmp_file, self.archive_path(scan_id))
+        except Exception as e:
+            logger.error(f"Failed to archive scan {scan_id}: {e}")
+            return False
+        with self._lock:
+            job = self.jobs.get(scan_id)
+            if job is not None:
+                # Storage location only; the served representation (and its ETag) is unchanged
+                job["archived"] = True
+            self._result_cache.pop(scan_id, None)
+        shutil.rmtree(src, ignore_errors=True)
+        return True
+
+    def apply_retention(self, max_age_days: float = 0, max_per_user: int = 0, max_bytes: int = 0) -> int:
+        """
+        Archive hot results outside the retention policy (0 disables a limit).
+        Oldest results go first. Returns the number of scans archived.
+        """
+        self.ensure_loaded()
+        with self._lock:
+            hot = [j for j in self.jobs.values() if j.get("has_result") and not j.get("archived")]
+            hot.sort(key=self._index_key)  # oldest first
+            evict = set()
+
+            if max_age_days:
+                cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+                evict.update(j["scan_id"] for j in hot if (j.get("submitted_at") or "") < cutoff)
+
+            if max_per_user:
+                kept: Dict[Optional[str], int] = {}
+                for job in reversed(hot):
+                    if job["scan_id"] in evict:
+                        continue
+                    kept[job.get("user_id")] = kept.get(job.get("user_id"), 0) + 1
+                    if kept[job.get("user_id")] > max_per_user:
+                        evict.add(job["scan_id"])
+
+            if max_bytes:
+                sizes = {j["scan_id"]: j.get("disk_bytes") or self._scan_bytes(j["scan_id"]) for j in hot}
+                total = sum(size for scan_id, size in sizes.items() if scan_id not in evict)
+                for job in hot:
+                    if total <= max_bytes:
+                        break
+                    if job["scan_id"] not in evict:
+                        evict.add(job["scan_id"])
+                        total -= sizes[job["scan_id"]]
+
+        archived = sum(1 for scan_id in evict if self.archive(scan_id))
+        if archived:
+            logger.info(f"Retention: archived {archived} scan results")
+            self.save()
+        return archived
+
+    def _migrate_inline_results(self) -> int:
+        """Older histories stored every result inline; split them out once"""
+        migrated = 0
+        for scan_id, job in self.jobs.items():
+            result = job.pop("result", None)
+            if result:
+                self._write_result(scan_id, result)
+                job["summary"] = result.get("summary")
+                job["has_result"] = True
+                migrated += 1
+        return migrated
+
+    def list_for_user(self, user_id: str, limit: int, cursor: Optional[str] = None,
+                      status: Optional[str] = None, query: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Return one page of a user's jobs, newest first, and the cursor for the next page.
+        status / query (case-insensitive target substring) filter the whole history, not just one page.
+        """
+        self.ensure_loaded()
+        with self._lock:
+            keys = self._by_user.get(user_id, [])
+            end = len(keys)
+            if cursor:
+                end = bisect.bisect_left(keys, decode_cursor(cursor))
+            if not status and not query:
+                start = max(0, end - limit)
+                page = [self.jobs[scan_id] for _, scan_id in reversed(keys[start:end])]
+                next_cursor = encode_cursor(keys[start]) if start > 0 else None
+                return page, next_cursor
+
+            query = (query or "").lower()
+            page, next_cursor = [], None
+            for i in range(end - 1, -1, -1):
+                job = self.jobs[keys[i][1]]
+                if (status and job.get("status") != status) or query not in (job.get("target") or "").lower():
+                    continue
+                if len(page) == limit:
+                    next_cursor = encode_cursor(self._index_key(page[-1]))
+                    break
+                page.append(job)
+        return page, next_cursor
+
+    def totals_for_user(self, user_id: str) -> Dict[str, Any]:
+        """All-time figures over a user's history, O(1)"""
+        self.ensure_loaded()
+        with self._lock:
+            totals = dict(self._totals.get(user_id) or {})
+        timed = totals.get("timed", 0)
+        return {
+            "scans": int(totals.get("scans", 0)),
+            "completed": int(totals.get("completed", 0)),
+            "issues": int(totals.get("issues", 0)),
+            "avg_duration_seconds": round(totals.get("duration", 0) / timed, 1) if timed else None
+        }
+
+    # -----------------
+    # Per-user index
+    # -----------------
+    @staticmethod
+    def _index_key(job: Dict[str, Any]) -> Tuple[str, str]:
+        return (job.get("submitted_at") or "", job["scan_id"])
+
+    def _index_add(self, job: Dict[str, Any]):
+        user_id = job.get("user_id")
+        if user_id:
+            bisect.insort(self._by_user.setdefault(user_id, []), self._index_key(job))
+
+    def _index_remove(self, job: Dict[str, Any]):
+        keys = self._by_user.get(job.get("user_id"))
+        if not keys:
+            return
+        key = self._index_key(job)
+        i = bisect.bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            del keys[i]
+
+    def _count(self, job: Dict[str, Any], sign: int):
+        """Add (sign=1) or remove (sign=-1) a job's contribution to its user's totals"""
+        user_id = job.get("user_id")
+        if not user_id:
+            return
+        totals = self._totals.setdefault(user_id, {})
+        summary = job.get("summary") or {}
+        totals["scans"] = totals.get("scans", 0) + sign
+        if job.get("status") == "completed":
+            totals["completed"] = totals.get("completed", 0) + sign
+        totals["issues"] = totals.get("issues", 0) + sign * (summary.get("top_issues_count") or 0)
+        if summary.get("duration_seconds") is not None:
+            totals["timed"] = totals.get("timed", 0) + sign
+            totals["duration"] = totals.get("duration", 0) + sign * summary["duration_seconds"]
+
+    def _rebuild_index(self):
+        self._by_user = {}
+        self._totals = {}
+        for job in self.jobs.values():
+            self._count(job, 1)
+            if job.get("user_id"):
+                self._by_user.setdefault(job["user_id"], []).append(self._index_key(job))
+        for keys in self._by_user.values():
+            keys.sort()
+
+def encode_cursor(key: Tuple[str, str]) -> str:
+    """Opaque pagination cursor: (timestamp, scan_id) of the last item served"""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        timestamp, scan_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (str(timestamp), str(scan_id))
+    except Exception:
+        raise ValueError("Invalid cursor")
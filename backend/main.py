@@ -1,22 +1,42 @@
 import os
 import time
+import asyncio
+import threading
 import logging
 import uuid
 import json
+import shutil
+import itertools
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack, asynccontextmanager, contextmanager
 from datetime import datetime
-from fastapi import FastAPI, BackgroundTasks, HTTPException, Depends
+from fastapi import FastAPI, BackgroundTasks, HTTPException, Depends, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, HttpUrl
-from typing import List, Optional, Dict, Any
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, HttpUrl
+from typing import Callable, List, Optional, Dict, Any, Tuple
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 
 # Import our layers
-from discovery import DiscoveryLayer
+from discovery import DiscoveryLayer, CrawlBudget
+from deadline import ScanDeadline
+from tuning import ResourceTuner
+from tracing import Trace, Tracer, chrome_trace
 from detection import DetectionLayer
 from filter import FilteringLayer
 from ai_layer import AIInterpretationLayer
+from passive_checks import PassiveChecksLayer
+from preflight import PreflightLayer
+from remediation import RemediationLayer
 from auth_utils import get_current_user, User
-from supabase import create_client, Client
+from job_store import JobStore, encode_cursor, decode_cursor
+from data_access import ScanRepository, run_blocking, io_executor
+from singleflight import ScanCoalescer, scan_key
+from findings_index import FindingIndex
+import findings_parser
+import exporters
 
 # Load environment variables
 load_dotenv()
@@ -30,10 +50,23 @@ if os.path.exists(bin_dir):
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm the history index in the background; requests that arrive first load it on demand
+    io_executor.submit(job_store.ensure_loaded)
+    io_executor.submit(enforce_retention)
+    io_executor.submit(index_existing_scans)
+    if RESUME_ON_STARTUP:
+        resume_executor.submit(resume_orphaned_scans)
+    yield
+    # Persist any pending history write before the worker exits
+    job_store.flush()
+
 app = FastAPI(
     title="SNL: Security Next Layer",
     description="Production-ready security scanner for fast-moving developers.",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -42,66 +75,88 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
+# Compress large results (brotli when brotli-asgi is installed, gzip otherwise)
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, minimum_size=1000)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=1000)
+
 # Initialize layers
 discovery_layer = DiscoveryLayer()
 detection_layer = DetectionLayer()
 filter_layer = FilteringLayer()
 ai_layer = AIInterpretationLayer()
+remediation_layer = RemediationLayer()
+tuner = ResourceTuner()
+tracer = Tracer()
+passive_layer = PassiveChecksLayer()
+preflight_layer = PreflightLayer()
 
-# Supabase Client Initialization
+# Supabase access (client is created on first use)
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") # Use Service Role for backend write-through
-supabase: Client = None
-
-if SUPABASE_URL and SUPABASE_KEY:
-    try:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-        logger.info("Supabase client initialized.")
-    except Exception as e:
-        logger.error(f"Failed to initialize Supabase client: {e}")
-else:
-    logger.warning("Supabase configuration missing. Database persistence disabled.")
+scans_repo = ScanRepository(SUPABASE_URL, SUPABASE_KEY)
 
 # -----------------
 # JOB STORE (In-Memory + File Persistence)
 # -----------------
-HISTORY_FILE = os.path.join(current_dir, "results", "scan_history.json")
-jobs: Dict[str, Dict[str, Any]] = {}
+RESULTS_DIR = os.getenv("SNL_RESULTS_DIR", os.path.join(current_dir, "results"))
+HISTORY_FILE = os.path.join(RESULTS_DIR, "scan_history.json")
+job_store = JobStore(HISTORY_FILE)
 
-def load_history():
-    """Load scan history from file"""
-    global jobs
-    try:
-        if os.path.exists(HISTORY_FILE):
-            with open(HISTORY_FILE, 'r') as f:
-                jobs = json.load(f)
-                logger.info(f"Loaded {len(jobs)} scans from history")
-    except Exception as e:
-        logger.error(f"Failed to load history: {e}")
-        jobs = {}
+# Retention: results outside these limits are moved to compressed archives
+# (still served by GET /scan/{scan_id}). 0 disables a limit.
+RETENTION_MAX_AGE_DAYS = float(os.getenv("SNL_RETENTION_MAX_AGE_DAYS", "30"))
+RETENTION_MAX_PER_USER = int(os.getenv("SNL_RETENTION_MAX_PER_USER", "50"))
+RETENTION_MAX_BYTES = int(os.getenv("SNL_RETENTION_MAX_MB", "512")) * 1024 * 1024
 
-def save_history():
-    """Save scan history to file"""
+# Fingerprints of every completed scan's findings, for diffs between scans of a target
+findings_index = FindingIndex(os.path.join(RESULTS_DIR, "findings_index"))
+
+# Single-flight: identical target+mode submissions share one execution
+coalescer = ScanCoalescer(recent_window=float(os.getenv("SNL_COALESCE_WINDOW_SECONDS", "300")))
+
+def enforce_retention():
     try:
-        os.makedirs(os.path.dirname(HISTORY_FILE), exist_ok=True)
-        with open(HISTORY_FILE, 'w') as f:
-            json.dump(jobs, f, indent=2, default=str)
+        job_store.apply_retention(
+            max_age_days=RETENTION_MAX_AGE_DAYS,
+            max_per_user=RETENTION_MAX_PER_USER,
+            max_bytes=RETENTION_MAX_BYTES
+        )
     except Exception as e:
-        logger.error(f"Failed to save history: {e}")
-
-# Load history on startup
-load_history()
+        logger.error(f"Retention pass failed: {e}")
 
 class ScanRequest(BaseModel):
     url: HttpUrl
     mode: Optional[str] = "quick"  # quick or deep
+    force: bool = False  # skip coalescing with identical in-flight/recent scans
+    crawl: Optional[CrawlBudget] = None  # defaults depend on mode
+    deadline_seconds: Optional[int] = Field(None, ge=60, le=7200)  # overall scan time budget; defaults depend on mode
 
 class JobCreatedResponse(BaseModel):
     scan_id: str
     message: str
 
+class BatchScanRequest(BaseModel):
+    targets: List[HttpUrl] = Field(..., min_length=1, max_length=100)
+    mode: Optional[str] = "quick"  # quick or deep
+    force: bool = False  # skip coalescing with identical in-flight/recent scans
+    crawl: Optional[CrawlBudget] = None  # applied to every target
+    deadline_seconds: Optional[int] = Field(None, ge=60, le=7200)  # per target
+
+class BatchScanItem(BaseModel):
+    scan_id: str
+    target: str
+
+class BatchCreatedResponse(BaseModel):
+    batch_id: str
+    scans: List[BatchScanItem]
+    message: str
+
 class ScanSummary(BaseModel):
     target: str
     status: str
@@ -111,125 +166,896 @@ class ScanSummary(BaseModel):
     params_found: int = 0
     templates_loaded: int = 0
     requests_sent: int = 0
+    crawl_stop_reason: Optional[str] = None  # max_urls / max_seconds / deadline when discovery was cut short
+    resolved_url: Optional[str] = None  # where the target's redirects end on its own host; this is what was crawled
+    offsite_redirect: Optional[str] = None  # the target redirects to another host (not scanned)
+    deadline_seconds: Optional[float] = None
+    partial: bool = False  # a stage was cut short by the scan deadline
+    partial_stages: List[str] = Field(default_factory=list)
+    tuning: Optional[Dict[str, Any]] = None  # Katana/Nuclei parallelism flags chosen for this scan
     duration_seconds: float
 
 class ScanResult(BaseModel):
     summary: ScanSummary
     findings: List[dict]
 
+class ScanHistoryItem(BaseModel):
+    scan_id: str
+    status: str
+    target: Optional[str] = None
+    submitted_at: Optional[str] = None
+    error: Optional[str] = None
+    summary: Optional[ScanSummary] = None
+    result: Optional[ScanResult] = None  # only with view=full
+
+class ScanHistoryTotals(BaseModel):
+    scans: int
+    completed: int
+    issues: int  # top issues summed over completed scans
+    avg_duration_seconds: Optional[float] = None
+
+class ScanHistoryPage(BaseModel):
+    items: List[ScanHistoryItem]
+    next_cursor: Optional[str] = None
+    totals: Optional[ScanHistoryTotals] = None  # the user's whole history, not just this page
+
 class ScanJobStatus(BaseModel):
     scan_id: str
     status: str  # pending, running, completed, failed
     target: Optional[str] = None
     submitted_at: Optional[str] = None
     result: Optional[ScanResult] = None
+    preliminary_findings: Optional[List[dict]] = None  # passive check findings while the full scan runs
+    ai_enrichment: Optional[str] = None  # pending, completed, failed (AI refinement of the report text)
     error: Optional[str] = None
 
-def run_scan_job(scan_id: str, target_url: str, mode: str = "quick", user_id: str = None):
-    logger.info(f"Starting job {scan_id} for {target_url} (mode: {mode})")
-    jobs[scan_id]["status"] = "running"
-    jobs[scan_id]["start_time"] = time.time()
+class FindingChange(BaseModel):
+    fingerprint: str
+    template: Optional[str] = None  # template-id[:matcher-name]
+    host: Optional[str] = None
+    location: Optional[str] = None  # normalised matched-at
+    name: Optional[str] = None
+    severity: Optional[str] = None
+
+class ScanDiff(BaseModel):
+    target: str
+    base_scan_id: str
+    head_scan_id: str
+    new: List[FindingChange]
+    fixed: List[FindingChange]
+    regressed: List[FindingChange]  # fixed at the base scan, back in the head scan
+    unchanged_count: int
+
+def create_job(scan_id: str, user_id: str, target: str, mode: str, **extra) -> Dict[str, Any]:
+    return job_store.create({
+        "scan_id": scan_id,
+        "user_id": user_id,
+        "target": target,
+        "mode": mode,
+        "status": "pending",
+        "submitted_at": datetime.now().isoformat(),
+        "error": None,
+        **extra
+    })
+
+def mark_running(scan_id: str, user_id: str = None):
+    job_store.update(scan_id, status="running", start_time=time.time(), deadline_start=None)
     if user_id:
-        jobs[scan_id]["user_id"] = user_id
-    save_history()
-    
-    # 0. Sync Status to Supabase
-    if supabase and user_id:
+        job_store.update(scan_id, user_id=user_id)
+    job_store.save()
+
+    # Sync Status to Supabase
+    if scans_repo.enabled and user_id:
         try:
-            supabase.table("scans").update({"status": "running"}).eq("scan_id", scan_id).execute()
+            with tracer.span(scan_id, "supabase.update_scan", "external"):
+                scans_repo.update_scan(scan_id, status="running")
         except Exception as e:
             logger.error(f"Failed to update scan status in Supabase: {e}")
-    
+
+def crawl_budget(job: Dict[str, Any]) -> CrawlBudget:
+    """The job's requested crawl budget, or the defaults for its mode"""
+    if job.get("crawl"):
+        return CrawlBudget(**job["crawl"])
+    return CrawlBudget.for_mode(job.get("mode", "quick"))
+
+PREFLIGHT_ENABLED = os.getenv("SNL_PREFLIGHT", "1") != "0"
+
+def preflight(scan_id: str, target_url: str) -> str:
+    """
+    DNS/TCP/TLS/HTTP check of the target; raises PreflightError for dead targets.
+    Returns the URL to crawl: where the redirects end, unless that is another host.
+    """
+    if not PREFLIGHT_ENABLED:
+        return target_url
+    logger.info(f"Step 0: Preflight for {target_url}")
+    with tracer.span(scan_id, "preflight", "external", target=target_url) as span:
+        result = asyncio.run(preflight_layer.check(target_url))
+        span.update(final_url=result["final_url"], status_code=result["status_code"], offsite_redirect=result["offsite_redirect"])
+    job_store.update(scan_id, preflight=result)
+    return target_url if result["offsite_redirect"] else result["final_url"]
+
+# scan_id -> (layer, process) of the Katana/Nuclei run a scan is executing, so deleting the scan can stop it
+scan_processes: Dict[str, Tuple[Any, Any]] = {}
+scan_processes_lock = threading.Lock()
+
+@contextmanager
+def tracked_process(scan_id: str, layer):
+    """on_process hook for a layer call that only serves this scan"""
+    def on_process(process):
+        with scan_processes_lock:
+            scan_processes[scan_id] = (layer, process)
+        if scan_id not in job_store:
+            layer._stop(process)  # deleted while the process was starting
     try:
-        # 1. DISCOVER (Management Step 3)
-        logger.info(f"Step 1: Discovering endpoints for {target_url}")
-        endpoints = discovery_layer.discover(str(target_url))
-        
-        # 2. DETECT (Management Step 1)
-        # discovery_layer puts output in "results/endpoints.txt"
-        endpoints_file = os.path.join(current_dir, "results", "endpoints.txt")
-        logger.info("Step 2: Detecting vulnerabilities")
-        raw_findings, stats = detection_layer.scan(endpoints_file, mode=mode)
-
-        # 3. Validation Check (Management Requirement Step 5 - MANDATORY)
-        # If benchmark target returns 0, we must FAIL FAST.
-        if "testphp.vulnweb.com" in str(target_url):
-            if len(raw_findings) == 0:
-                logger.error("CRITICAL: Scanner validation failed on testphp.vulnweb.com")
-                raise Exception("Scanner validation failed: No findings on benchmark target.")
-
-        # 4. DECIDE (Filter & Prioritize - Management Step 4)
-        logger.info("Step 3: Filtering findings")
+        yield on_process
+    finally:
+        with scan_processes_lock:
+            scan_processes.pop(scan_id, None)
+
+def stop_execution(scan_id: str):
+    """Stop the Katana/Nuclei process of a deleted scan; the run then ends through fail_scan"""
+    with scan_processes_lock:
+        entry = scan_processes.pop(scan_id, None)
+    if entry is not None:
+        layer, process = entry
+        logger.info(f"Stopping {layer.__class__.__name__} run of deleted scan {scan_id}")
+        layer._stop(process)
+
+def discover_endpoints(scan_id: str, target_url: str) -> Tuple[List[str], Dict[str, Any]]:
+    """Katana crawl into the scan's own directory (results/scans/<scan_id>/), within the scan deadline"""
+    work_dir = job_store.scan_dir(scan_id)
+    os.makedirs(work_dir, exist_ok=True)
+    crawl_url = preflight(scan_id, str(target_url))
+    logger.info(f"Step 1: Discovering endpoints for {crawl_url}")
+    job = job_store.get(scan_id)
+    budget = crawl_budget(job)
+    allotted = ScanDeadline.for_job(job).allot("discovery")
+    if allotted == 0:
+        # No time left to crawl: detection (if anything is left for it) covers the target URL only
+        logger.warning(f"Scan {scan_id}: deadline reached before discovery. Skipping the crawl.")
+        with open(os.path.join(work_dir, "endpoints.txt"), 'w') as f:
+            f.write(crawl_url + "\n")
+        tracer.add(scan_id, "katana", time.time(), time.time(), "external", skipped="deadline")
+        return [crawl_url], {"urls": 1, "elapsed_seconds": 0, "stop_reason": "deadline", "resolved_url": crawl_url}
+    limited = allotted < budget.max_seconds
+    if limited:
+        logger.info(f"Scan deadline limits the crawl to {allotted}s")
+        budget = budget.model_copy(update={"max_seconds": allotted})
+    flags = tuner.katana_flags()
+    budget = budget.model_copy(update={
+        "concurrency": budget.concurrency or flags.get("c"),
+        "parallelism": budget.parallelism or flags.get("p")
+    })
+    with tracer.span(scan_id, "katana", "external", url=crawl_url, max_seconds=budget.max_seconds) as span:
+        with tracked_process(scan_id, discovery_layer) as on_process:
+            endpoints, crawl_stats = discovery_layer.discover(crawl_url, output_dir=work_dir, budget=budget, on_process=on_process)
+        span.update(endpoints=len(endpoints), stop_reason=crawl_stats.get("stop_reason"))
+    crawl_stats["tuning"] = {"c": budget.concurrency, "p": budget.parallelism}
+    crawl_stats["resolved_url"] = crawl_url
+    if limited and crawl_stats.get("stop_reason") == "max_seconds":
+        crawl_stats["stop_reason"] = "deadline"
+    return endpoints, crawl_stats
+
+def detect(scan_id: str, target_list_file: str, mode: str, output_dir: str, resume: bool = False, timeout: int = None,
+           shared: bool = False) -> Tuple[List[dict], Dict[str, Any]]:
+    """
+    Nuclei within what is left of the scan deadline. With no time left the stage is
+    skipped and the scan is reported on the data it already has.
+    A shared run (one Nuclei process for a batch chunk) is not stopped when scan_id is deleted.
+    """
+    timeout = ScanDeadline.for_job(job_store.get(scan_id)).allot("detection") if timeout is None else timeout
+    if timeout == 0:
+        logger.warning(f"Scan {scan_id}: deadline reached before detection. Reporting partial results.")
+        return [], {"templates_loaded": 0, "requests_sent": 0, "timed_out": True}
+    flags = tuner.nuclei_flags()
+    logger.info(f"Nuclei parallelism: {flags or 'tool defaults'} ({tuner.resources()})")
+    with tracer.span(scan_id, "nuclei", "external", mode=mode, timeout=timeout, resume=resume) as span:
+        with ExitStack() as stack:
+            on_process = None if shared else stack.enter_context(tracked_process(scan_id, detection_layer))
+            findings, stats = detection_layer.scan(target_list_file, mode=mode, output_dir=output_dir, resume=resume, timeout=timeout,
+                                                   tuning=flags, on_process=on_process)
+        span.update(findings=len(findings), templates_loaded=stats.get("templates_loaded"), timed_out=stats.get("timed_out"))
+        trace_nuclei_phases(scan_id, stats.get("timings") or {})
+    stats["tuning"] = {**flags, **tuner.resources()}
+    return findings, stats
+
+def trace_nuclei_phases(scan_id: str, timings: Dict[str, float]):
+    """Split the Nuclei span into template load and the detection loop"""
+    if not timings.get("finished"):
+        return
+    loaded = timings.get("templates_loaded")
+    if loaded:
+        tracer.add(scan_id, "nuclei.template_load", timings["started"], loaded, "external")
+    tracer.add(scan_id, "nuclei.detection_loop", loaded or timings["started"], timings["finished"], "external",
+               first_finding_after=round(timings["first_finding"] - timings["started"], 3) if timings.get("first_finding") else None)
+
+# -----------------
+# PASSIVE CHECKS
+# -----------------
+# Header/cookie/TLS/CORS checks run next to the Katana -> Nuclei pipeline and are
+# published on the job as preliminary findings within seconds of submission.
+PASSIVE_CHECK_WORKERS = int(os.getenv("SNL_PASSIVE_CHECK_WORKERS", "4"))
+PASSIVE_CHECK_PAGES = int(os.getenv("SNL_PASSIVE_CHECK_PAGES", "3"))  # discovered pages checked besides the target
+passive_executor = ThreadPoolExecutor(max_workers=PASSIVE_CHECK_WORKERS, thread_name_prefix="snl-passive")
+passive_lock = threading.Lock()
+
+def start_passive_checks(scan_id: str, urls: List[str], host_checks: bool = True) -> Future:
+    """Run passive checks on a worker and publish findings on the job as soon as they arrive"""
+    def run() -> List[dict]:
+        try:
+            with tracer.span(scan_id, "passive_checks", "external", urls=len(urls), host_checks=host_checks):
+                findings = asyncio.run(passive_layer.run(urls, host_checks=host_checks))
+        except Exception as e:
+            logger.error(f"Passive checks failed for {scan_id}: {e}")
+            return []
+        with passive_lock:
+            job = job_store.get(scan_id)
+            if findings and job and job["status"] == "running":
+                job_store.update(scan_id, preliminary_findings=merge_passive_findings(job.get("preliminary_findings") or [], findings))
+        return findings
+    return passive_executor.submit(run)
+
+def merge_passive_findings(*groups: List[dict]) -> List[dict]:
+    """Passive findings are per host: keep one per template and host across page checks"""
+    unique = {}
+    for findings in groups:
+        for f in findings:
+            unique.setdefault((f["template-id"], finding_host(f)), f)
+    return list(unique.values())
+
+def collect_passive_findings(futures: List[Future]) -> List[dict]:
+    return merge_passive_findings(*(future.result() for future in futures if future))
+
+def record_passive_findings(scan_id: str, futures: List[Future]) -> List[dict]:
+    """Collect passive findings and append them to the scan's raw findings file"""
+    findings = collect_passive_findings(futures)
+    with open(os.path.join(job_store.scan_dir(scan_id), "raw_findings.json"), 'a') as f:
+        findings_parser.write_findings(findings, f)
+    return findings
+
+# -----------------
+# CHECKPOINTS
+# -----------------
+# Each finished stage is recorded on the job next to its output in the scan dir:
+#   discovered -> endpoints.txt (+ crawl stats)
+#   detected   -> raw_findings.json (+ Nuclei stats)
+# While Nuclei runs, raw_findings.json holds the findings so far and nuclei_stderr.log
+# the path of Nuclei's resume file if it was interrupted. On startup, scans left
+# pending/running by the previous process continue from their last finished stage.
+RESUME_ON_STARTUP = os.getenv("SNL_RESUME_ON_STARTUP", "1") != "0"
+RESUME_MAX_ATTEMPTS = int(os.getenv("SNL_RESUME_MAX_ATTEMPTS", "2"))  # restarts a scan may survive
+RESUME_WORKERS = int(os.getenv("SNL_RESUME_WORKERS", "2"))
+resume_executor = ThreadPoolExecutor(max_workers=RESUME_WORKERS, thread_name_prefix="snl-resume")
+
+def save_checkpoint(scan_id: str, stage: str, **data):
+    checkpoint = job_store.get(scan_id).get("checkpoint") or {}
+    job_store.update(scan_id, checkpoint={**checkpoint, "stage": stage, **data})
+    job_store.save()
+
+def load_endpoints(scan_id: str) -> List[str]:
+    with open(os.path.join(job_store.scan_dir(scan_id), "endpoints.txt"), 'r') as f:
+        return [line.strip() for line in f if line.strip()]
+
+def resume_orphaned_scans():
+    """Continue scans a previous process left pending/running"""
+    orphans = [job for job in job_store.values() if job["status"] in ("pending", "running")]
+    for job in job_store.values():
+        if job.get("ai_enrichment") == "pending":
+            job_store.update(job["scan_id"], ai_enrichment="failed")  # offline text stays
+
+    # Leaders first, so the scans coalesced onto them attach again
+    orphans.sort(key=lambda job: bool(job.get("coalesced_with")))
+    for job in orphans:
+        scan_id, user_id = job["scan_id"], job.get("user_id")
+        attempts = job.get("resume_attempts", 0) + 1
+        if attempts > RESUME_MAX_ATTEMPTS:
+            fail_scan(scan_id, Exception("Scan was interrupted by a server restart"), user_id)
+            continue
+        job_store.update(scan_id, resume_attempts=attempts)
+        if rejoin_scan(job, resume_executor.submit):
+            logger.info(f"Resuming orphaned scan {scan_id} (stage: {(job.get('checkpoint') or {}).get('stage') or 'start'})")
+    job_store.save()
+
+def rejoin_scan(job: Dict[str, Any], submit: Callable) -> bool:
+    """
+    Join the scan's coalescing key again: attach it to a running identical scan,
+    adopt a recent result, or execute it through submit(fn, *args).
+    Returns True when the scan executes itself.
+    """
+    scan_id, user_id = job["scan_id"], job.get("user_id")
+    mode = job.get("mode", "quick")
+    leader_id, in_flight = coalescer.join(coalesce_key(scan_id, job["target"], mode), scan_id, user_id)
+    if leader_id is None:
+        if job.get("coalesced_with"):
+            job_store.update(scan_id, coalesced_with=None)
+        submit(run_scan_job, scan_id, job["target"], mode, user_id)
+        return True
+    if in_flight:
+        job_store.update(scan_id, status="running", coalesced_with=leader_id)
+    else:
+        submit(adopt_recent_result, scan_id, leader_id, user_id)
+    return False
+
+def check_discovered_pages(scan_id: str, target_url: str, endpoints: List[str]) -> Optional[Future]:
+    """Page-level passive checks on the first few crawled pages (the target itself is already covered)"""
+    pages = [e for e in endpoints if e.rstrip("/") != str(target_url).rstrip("/")][:PASSIVE_CHECK_PAGES]
+    return start_passive_checks(scan_id, pages, host_checks=False) if pages else None
+
+def complete_scan(scan_id: str, target_url: str, endpoints: List[str], raw_findings: List[dict], stats: Dict[str, Any], user_id: str = None, crawl_stats: Dict[str, Any] = None):
+    """Validate, filter, explain and store the result of a scan whose detection has finished"""
+    if scan_id not in job_store:
+        raise Exception("Scan was deleted")  # fail_scan cleans up after it
+    # 3. Validation Check (Management Requirement Step 5 - MANDATORY)
+    # If benchmark target returns 0, we must FAIL FAST.
+    if "testphp.vulnweb.com" in str(target_url):
+        if len(raw_findings) == 0:
+            logger.error("CRITICAL: Scanner validation failed on testphp.vulnweb.com")
+            raise Exception("Scanner validation failed: No findings on benchmark target.")
+
+    # 4. DECIDE (Filter & Prioritize - Management Step 4)
+    logger.info("Step 3: Filtering findings")
+    with tracer.span(scan_id, "filtering", raw_findings=len(raw_findings)):
         prioritized = filter_layer.prioritize(raw_findings)
 
-        # 5. EXPLAIN (AI Interpretation - Management Step 6: Explanation only)
-        logger.info("Step 4: AI Interpretation")
-        final_report = ai_layer.interpret(prioritized)
-
-        duration = round(time.time() - jobs[scan_id]["start_time"], 2)
-
-        # 6. Summary Requirements (Management Step 7)
-        summary = ScanSummary(
-            target=str(target_url),
-            status="completed",
-            total_endpoints=len(endpoints),
-            raw_findings_count=len(raw_findings),
-            top_issues_count=len(final_report),
-            params_found=len([e for e in endpoints if "?" in e]), # Count endpoints with params
-            templates_loaded=stats.get("templates_loaded", 0),
-            requests_sent=stats.get("requests_sent", 0),
-            duration_seconds=duration
-        )
+    # 5. EXPLAIN (Management Step 6: Explanation only)
+    # Offline remediation text now; AI interpretation refines it in the background
+    logger.info("Step 4: Remediation report")
+    with tracer.span(scan_id, "remediation", findings=len(prioritized)):
+        final_report = remediation_layer.interpret(prioritized)
 
-        result = ScanResult(
-            summary=summary,
-            findings=final_report
-        )
+    job = job_store.get(scan_id)
+    duration = round(time.time() - job["start_time"], 2)
+    partial_stages = []
+    if (crawl_stats or {}).get("stop_reason") == "deadline":
+        partial_stages.append("discovery")
+    if stats.get("timed_out"):
+        partial_stages.append("detection")
+
+    # 6. Summary Requirements (Management Step 7)
+    summary = ScanSummary(
+        target=str(target_url),
+        status="completed",
+        total_endpoints=len(endpoints),
+        raw_findings_count=len(raw_findings),
+        top_issues_count=len(final_report),
+        params_found=len([e for e in endpoints if "?" in e]), # Count endpoints with params
+        templates_loaded=stats.get("templates_loaded", 0),
+        requests_sent=stats.get("requests_sent", 0),
+        crawl_stop_reason=(crawl_stats or {}).get("stop_reason"),
+        resolved_url=(crawl_stats or {}).get("resolved_url"),
+        offsite_redirect=(job.get("preflight") or {}).get("offsite_redirect"),
+        deadline_seconds=ScanDeadline.for_job(job).seconds,
+        partial=bool(partial_stages),
+        partial_stages=partial_stages,
+        tuning={"katana": (crawl_stats or {}).get("tuning"), "nuclei": stats.get("tuning")},
+        duration_seconds=duration
+    )
+
+    result = ScanResult(
+        summary=summary,
+        findings=final_report
+    )
 
-        jobs[scan_id]["status"] = "completed"
-        jobs[scan_id]["result"] = result.model_dump()
-        save_history()
-        logger.info(f"Job {scan_id} completed successfully. Found {len(raw_findings)} findings.")
+    enrich = AI_ENRICHMENT_ENABLED and bool(final_report)
+    if enrich:
+        with ai_enrichment_lock:
+            ai_enrichment_queue[scan_id] = [(scan_id, user_id)]
+    with tracer.span(scan_id, "store_result"):
+        job_store.set_result(scan_id, result.model_dump(), status="completed", preliminary_findings=None,
+                             checkpoint=None, ai_enrichment="pending" if enrich else None)
+        job_store.save()
+        enforce_retention()
+    with tracer.span(scan_id, "findings_index"):
+        index_findings(scan_id, raw_findings)
+    logger.info(f"Job {scan_id} completed successfully. Found {len(raw_findings)} findings.")
 
-        # 7. Sync Completion to Supabase
-        if supabase and user_id:
+    # 7. Sync Completion to Supabase
+    if scans_repo.enabled and user_id:
+        try:
+            # Update scan record
+            with tracer.span(scan_id, "supabase.update_scan", "external"):
+                scans_repo.update_scan(scan_id, status="completed", completed_at=datetime.now().isoformat())
+
+            # Insert results
+            with tracer.span(scan_id, "supabase.insert_results", "external", rows=len(final_report)):
+                scans_repo.insert_results(scan_id, final_report)
+            logger.info(f"Synced {len(final_report)} results to Supabase.")
+        except Exception as e:
+            logger.error(f"Failed to sync to Supabase: {e}")
+
+    share_outcome(scan_id)
+    if enrich:
+        ai_executor.submit(enrich_report, scan_id, prioritized)
+
+# -----------------
+# FINDINGS INDEX
+# -----------------
+def stored_raw_findings(scan_id: str) -> List[dict]:
+    """Raw findings of a scan from its per-scan file (or archive)"""
+    try:
+        with job_store.open_scan_file(scan_id, "raw_findings.json") as f:
+            return list(findings_parser.iter_findings(f))
+    except (FileNotFoundError, OSError) as e:
+        logger.warning(f"No stored raw findings for {scan_id}: {e}")
+        return []
+
+def iter_stored_findings(scan_id: str):
+    """Raw findings lines of a scan, read one at a time (the file stays open while iterating)"""
+    with job_store.open_scan_file(stored_file_source(scan_id, "raw_findings.json"), "raw_findings.json") as f:
+        yield from f
+
+def stored_file_source(scan_id: str, name: str) -> str:
+    """
+    Scan whose copy of a per-scan file serves scan_id: its own, or for a coalesced
+    scan that has no copy (yet), the scan it attached to while that still exists.
+    """
+    job = job_store.get(scan_id) or {}
+    leader = job.get("coalesced_with")
+    if leader and not job.get("archived") and leader in job_store \
+            and not os.path.exists(os.path.join(job_store.scan_dir(scan_id), name)):
+        return leader
+    return scan_id
+
+def share_scan_file(leader_id: str, scan_id: str, name: str):
+    """Give a coalesced scan its own copy of one of its leader's per-scan files (hard link when possible)"""
+    dest = os.path.join(job_store.scan_dir(scan_id), name)
+    tmp_file = dest + ".tmp"
+    try:
+        os.makedirs(job_store.scan_dir(scan_id), exist_ok=True)
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        try:
+            os.link(os.path.join(job_store.scan_dir(leader_id), name), tmp_file)
+        except OSError:
+            # Archived leader, or a filesystem without hard links
+            with job_store.open_scan_file(leader_id, name) as src, open(tmp_file, 'wb') as out:
+                shutil.copyfileobj(src, out)
+        os.replace(tmp_file, dest)
+    except FileNotFoundError:
+        pass  # the leader never wrote it
+    except OSError as e:
+        logger.error(f"Failed to copy {name} of {leader_id} to {scan_id}: {e}")
+
+def index_findings(scan_id: str, raw_findings: List[dict]):
+    """Add a completed scan's fingerprints to its target's history; never fails the scan"""
+    job = job_store.get(scan_id)
+    if job is None:
+        return
+    try:
+        counts = findings_index.record(job.get("user_id"), job["target"], scan_id, raw_findings)
+        logger.info(f"Indexed findings of {scan_id}: {counts['new']} new, {counts['fixed']} fixed since the previous scan")
+    except Exception as e:
+        logger.error(f"Failed to index findings of {scan_id}: {e}")
+
+def index_existing_scans():
+    """One-time backfill: index completed scans that predate the findings index, oldest first"""
+    if findings_index.initialized:
+        return
+    completed = [j for j in job_store.values() if j.get("status") == "completed" and j.get("has_result")]
+    completed.sort(key=lambda j: j.get("submitted_at") or "")
+    for job in completed:
+        index_findings(job["scan_id"], stored_raw_findings(stored_file_source(job["scan_id"], "raw_findings.json")))
+    findings_index.mark_initialized()
+    if completed:
+        logger.info(f"Findings index: backfilled {len(completed)} scans")
+
+# -----------------
+# AI ENRICHMENT
+# -----------------
+AI_ENRICHMENT_ENABLED = os.getenv("SNL_AI_ENRICHMENT", "1") != "0" and bool(os.getenv("OPENAI_API_KEY"))
+AI_ENRICHMENT_WORKERS = int(os.getenv("SNL_AI_WORKERS", "2"))
+ai_executor = ThreadPoolExecutor(max_workers=AI_ENRICHMENT_WORKERS, thread_name_prefix="snl-ai")
+# leader scan_id -> (scan_id, user_id) of the scans still waiting for its enrichment;
+# scans adopting the leader's result join the list until enrich_report drains it
+ai_enrichment_queue: Dict[str, List[Tuple[str, Optional[str]]]] = {}
+ai_enrichment_lock = threading.Lock()
+
+def enrich_report(scan_id: str, prioritized: List[dict]):
+    """
+    Replace the offline remediation text of a completed scan (and the scans that
+    share its result, including ones that adopt it while this runs) with the AI
+    interpretation. The stored result is updated in place, so pollers see a new
+    ETag; on failure the offline text stays.
+    """
+    tracer.start(scan_id)  # joins the scan's trace if it is still running
+    try:
+        with tracer.span(scan_id, "openai.explain", "external", findings=len(prioritized)):
+            interpretations = ai_layer.explain(prioritized)
+    except Exception as e:
+        logger.error(f"AI enrichment failed for {scan_id}: {e}")
+        interpretations = None
+
+    while True:
+        with ai_enrichment_lock:
+            if not ai_enrichment_queue.get(scan_id):
+                # Later adopters see the leader's final state and copy it
+                ai_enrichment_queue.pop(scan_id, None)
+                break
+            enriched_id, user_id = ai_enrichment_queue[scan_id].pop(0)
+        job = job_store.get(enriched_id)
+        if job is None:
+            continue  # deleted in the meantime
+        if job.get("archived"):
+            job_store.update(enriched_id, ai_enrichment="failed")  # archives are not rewritten; offline text stays
+            continue
+        result = job_store.get_result(enriched_id)
+        if interpretations is None or result is None:
+            job_store.update(enriched_id, ai_enrichment="failed")
+            continue
+
+        findings = ai_layer.merge([dict(f) for f in result["findings"]], interpretations)
+        job_store.set_result(enriched_id, {**result, "findings": findings}, ai_enrichment="completed")
+        if scans_repo.enabled and user_id:
             try:
-                # Update scan record
-                supabase.table("scans").update({
-                    "status": "completed",
-                    "completed_at": datetime.now().isoformat()
-                }).eq("scan_id", scan_id).execute()
-                
-                # Insert results
-                for f in final_report:
-                    supabase.table("scan_results").insert({
-                        "scan_id": scan_id,
-                        "severity": f.get("severity"),
-                        "title": f.get("name"),
-                        "description": f.get("interpretation", {}).get("what_is_wrong"),
-                        "remediation": f.get("interpretation", {}).get("how_to_fix"),
-                        "raw_json": f
-                    }).execute()
-                logger.info(f"Synced {len(final_report)} results to Supabase.")
+                with tracer.span(scan_id, "supabase.replace_results", "external", scan=enriched_id):
+                    scans_repo.replace_results(enriched_id, findings)
             except Exception as e:
-                logger.error(f"Failed to sync to Supabase: {e}")
+                logger.error(f"Failed to sync AI interpretation to Supabase: {e}")
+    job_store.save()
+    trace = tracer.finish(scan_id)
+    if trace is not None:
+        save_trace(scan_id, trace)
+    logger.info(f"AI enrichment for {scan_id} finished ({'completed' if interpretations is not None else 'failed'})")
+
+def fail_scan(scan_id: str, error: Exception, user_id: str = None):
+    if scan_id not in job_store:
+        # Deleted while running: its followers were handed on by delete_scan, nothing to report
+        logger.info(f"Job {scan_id} stopped after it was deleted ({error})")
+        shutil.rmtree(job_store.scan_dir(scan_id), ignore_errors=True)
+        return
+    logger.error(f"Job {scan_id} failed: {str(error)}")
+    job_store.update(scan_id, status="failed", error=str(error), checkpoint=None)
+    # Failed after its result was stored: the enrichment it queued will never run
+    with ai_enrichment_lock:
+        waiting = ai_enrichment_queue.pop(scan_id, [])
+    for waiting_id, _ in waiting:
+        if waiting_id != scan_id:
+            job_store.update(waiting_id, ai_enrichment="failed")
+    job_store.save()
+
+    # Sync failure to Supabase
+    if scans_repo.enabled and user_id:
+        try:
+            with tracer.span(scan_id, "supabase.update_scan", "external"):
+                scans_repo.update_scan(
+                    scan_id,
+                    status="failed",
+                    error_message=str(error),
+                    completed_at=datetime.now().isoformat()
+                )
+        except Exception as se:
+            logger.error(f"Failed to sync failure to Supabase: {se}")
+
+    share_outcome(scan_id, error)
+
+def adopt_result(scan_id: str, leader_id: str, result: Dict[str, Any], user_id: str = None):
+    """Complete a coalesced scan with the result of the execution it attached to"""
+    job = job_store.get(scan_id)
+    if job is None or job["status"] == "cancelled":
+        return
+    with ai_enrichment_lock:
+        waiting = ai_enrichment_queue.get(leader_id)
+        if waiting is not None:
+            ai_enrichment = "pending"  # enrich_report rewrites this scan too
+        else:
+            ai_enrichment = (job_store.get(leader_id) or {}).get("ai_enrichment")
+            if ai_enrichment == "completed":
+                result = job_store.get_result(leader_id) or result  # may have been enriched since it was read
+            elif ai_enrichment != "failed":
+                ai_enrichment = None
+        # Stored under the lock so enrich_report never picks the scan up before its result exists
+        job_store.set_result(scan_id, result, status="completed", coalesced_with=leader_id,
+                             ai_enrichment=ai_enrichment)
+        if waiting is not None:
+            waiting.append((scan_id, user_id))
+    job_store.save()
+    # Own copies, so the scan stays exportable (and traceable) if the leader is deleted
+    share_scan_file(leader_id, scan_id, "raw_findings.json")
+    share_scan_file(leader_id, scan_id, "trace.json")
+    index_findings(scan_id, stored_raw_findings(scan_id))
+    logger.info(f"Job {scan_id} completed with shared result of {leader_id}")
 
+    if scans_repo.enabled and user_id:
+        try:
+            scans_repo.update_scan(scan_id, status="completed", completed_at=datetime.now().isoformat())
+            scans_repo.insert_results(scan_id, result.get("findings", []))
+        except Exception as e:
+            logger.error(f"Failed to sync to Supabase: {e}")
+
+def adopt_recent_result(scan_id: str, leader_id: str, user_id: str = None):
+    result = job_store.get_result(leader_id)
+    if result is None:
+        fail_scan(scan_id, Exception("Shared scan result is no longer available"), user_id)
+        return
+    adopt_result(scan_id, leader_id, result, user_id)
+
+def share_outcome(leader_id: str, error: Exception = None):
+    """Fan a finished scan's outcome out to the requests coalesced onto it"""
+    followers = coalescer.finish(leader_id, succeeded=error is None)
+    if not followers:
+        return
+    result = job_store.get_result(leader_id) if error is None else None
+    for scan_id, user_id in followers:
+        job = job_store.get(scan_id)
+        if job is None or job["status"] == "cancelled":
+            continue
+        if result is not None:
+            adopt_result(scan_id, leader_id, result, user_id)
+        else:
+            fail_scan(scan_id, error or Exception("Shared scan produced no result"), user_id)
+
+def coalesce_key(scan_id: str, target: str, mode: str) -> str:
+    # Scans with different crawl budgets or deadlines are not interchangeable
+    job = job_store.get(scan_id)
+    options = {k: job[k] for k in ("crawl", "deadline_seconds") if job.get(k)}
+    variant = f"{mode}|{json.dumps(options, sort_keys=True)}" if options else mode
+    return scan_key(target, variant)
+
+def coalesce(scan_id: str, target: str, mode: str, user_id: str, background_tasks: BackgroundTasks) -> bool:
+    """
+    Attach a freshly created scan to an identical in-flight or recent one.
+    Returns False when the scan has to be executed itself.
+    """
+    leader_id, in_flight = coalescer.join(coalesce_key(scan_id, target, mode), scan_id, user_id)
+    if leader_id is None:
+        return False
+    if in_flight:
+        logger.info(f"Scan {scan_id} attached to in-flight scan {leader_id}")
+        job_store.update(scan_id, status="running", start_time=time.time(), coalesced_with=leader_id)
+        job_store.save()
+    else:
+        logger.info(f"Scan {scan_id} reuses recent result of {leader_id}")
+        background_tasks.add_task(adopt_recent_result, scan_id, leader_id, user_id)
+    return True
+
+# -----------------
+# TRACES
+# -----------------
+def save_trace(scan_id: str, trace: Trace):
+    """Store a scan's finished trace as trace.json (Chrome trace format), after any earlier runs' events"""
+    job = job_store.get(scan_id)
+    if job is None or job.get("archived"):
+        return
+    path = os.path.join(job_store.scan_dir(scan_id), "trace.json")
+    try:
+        events = []
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                events = findings_parser.load(f).get("traceEvents", [])
+        events += trace.chrome_events()
+        os.makedirs(job_store.scan_dir(scan_id), exist_ok=True)
+        with open(path, 'w') as f:
+            findings_parser.dump(chrome_trace(scan_id, events, profiled=trace.profiled, truncated=trace.truncated), f)
     except Exception as e:
-        logger.error(f"Job {scan_id} failed: {str(e)}")
-        jobs[scan_id]["status"] = "failed"
-        jobs[scan_id]["error"] = str(e)
-        save_history()
-        
-        # Sync failure to Supabase
-        if supabase and user_id:
+        logger.error(f"Failed to save trace for {scan_id}: {e}")
+        return
+    # Scans that adopted this result before the trace was finished
+    for follower in job_store.values():
+        if follower.get("coalesced_with") == scan_id and follower["status"] == "completed":
+            share_scan_file(scan_id, follower["scan_id"], "trace.json")
+
+def run_scan_job(scan_id: str, target_url: str, mode: str = "quick", user_id: str = None):
+    """Run a scan, skipping the stages its checkpoint says are already done"""
+    checkpoint = job_store.get(scan_id).get("checkpoint") or {}
+    stage = checkpoint.get("stage")
+    logger.info(f"Starting job {scan_id} for {target_url} (mode: {mode})" + (f", resuming after stage '{stage}'" if stage else ""))
+    with tracer.session(scan_id, save_trace), tracer.span(scan_id, "scan", "scan", target=str(target_url), mode=mode, resumed_after=stage):
+        mark_running(scan_id, user_id)
+        work_dir = job_store.scan_dir(scan_id)
+
+        # 0. Passive checks start right away, next to the crawl
+        passive = [start_passive_checks(scan_id, [str(target_url)])] if stage != "detected" else []
+
+        # Counted as active so concurrent scans share the host's CPUs/memory
+        with tuner.scan_slot():
+            try:
+                # 1. DISCOVER (Management Step 3)
+                if stage in ("discovered", "detected"):
+                    endpoints, crawl_stats = load_endpoints(scan_id), checkpoint.get("crawl_stats")
+                else:
+                    with tracer.span(scan_id, "discovery"):
+                        endpoints, crawl_stats = discover_endpoints(scan_id, target_url)
+                    save_checkpoint(scan_id, "discovered", crawl_stats=crawl_stats)
+                if stage != "detected":
+                    passive.append(check_discovered_pages(scan_id, target_url, endpoints))
+
+                # 2. DETECT (Management Step 1)
+                if stage == "detected":
+                    raw_findings, stats = detection_layer.read_findings(os.path.join(work_dir, "raw_findings.json")), checkpoint.get("stats", {})
+                else:
+                    logger.info("Step 2: Detecting vulnerabilities")
+                    with tracer.span(scan_id, "detection"):
+                        raw_findings, stats = detect(scan_id, os.path.join(work_dir, "endpoints.txt"), mode, work_dir,
+                                                     resume=stage == "discovered")
+                    with tracer.span(scan_id, "passive_checks.wait"):
+                        raw_findings = raw_findings + record_passive_findings(scan_id, passive)
+                    save_checkpoint(scan_id, "detected", stats=stats)
+
+                complete_scan(scan_id, target_url, endpoints, raw_findings, stats, user_id, crawl_stats)
+
+            except Exception as e:
+                fail_scan(scan_id, e, user_id)
+
+# -----------------
+# BATCH SCANS
+# -----------------
+BATCH_DISCOVERY_WORKERS = int(os.getenv("SNL_BATCH_DISCOVERY_WORKERS", "4"))
+# Targets per Nuclei invocation: templates are parsed once per invocation
+BATCH_TARGETS_PER_DETECTION = int(os.getenv("SNL_BATCH_TARGETS_PER_DETECTION", "25"))
+
+def finding_host(finding: Dict[str, Any]) -> str:
+    """Hostname a Nuclei finding was matched on (matched-at may be a URL or host:port)"""
+    return location_host(finding.get("matched-at") or finding.get("host") or "")
+
+def location_host(location: str) -> str:
+    if "://" not in location:
+        location = "//" + location
+    return (urlparse(location).hostname or "").lower()
+
+# Second-level labels under country TLDs (example.co.uk); no public suffix list is bundled
+COUNTRY_SECOND_LEVELS = {"co", "com", "org", "net", "gov", "ac", "edu"}
+
+def without_www(host: str) -> str:
+    return host[4:] if host.startswith("www.") else host
+
+def registrable_domain(host: str) -> str:
+    """Approximate registrable domain of a hostname (IP addresses are returned as they are)"""
+    labels = host.split(".")
+    if ":" in host or all(label.isdigit() for label in labels):
+        return host
+    keep = 3 if len(labels) > 2 and len(labels[-1]) == 2 and labels[-2] in COUNTRY_SECOND_LEVELS else 2
+    return ".".join(labels[-keep:])
+
+def demux_findings(raw_findings: List[dict], endpoints_by_scan: Dict[str, List[str]], batch_id: str = "") -> Dict[str, List[dict]]:
+    """
+    Split findings of a multi-target Nuclei run back into per-scan lists by host.
+    A finding whose host (from matched-at or host) no target crawled goes to the targets
+    with the same host minus "www.", else the same registrable domain; the rest are logged.
+    """
+    matchers = (lambda host: host, without_www, registrable_domain)
+    scans_by_key: List[Dict[str, List[str]]] = [{} for _ in matchers]
+    for scan_id, endpoints in endpoints_by_scan.items():
+        for host in {(urlparse(e).hostname or "").lower() for e in endpoints} - {""}:
+            for key, index in zip(matchers, scans_by_key):
+                if scan_id not in index.setdefault(key(host), []):
+                    index[key(host)].append(scan_id)
+
+    per_scan: Dict[str, List[dict]] = {scan_id: [] for scan_id in endpoints_by_scan}
+    unattributed: Dict[str, int] = {}
+    for finding in raw_findings:
+        hosts = {location_host(finding.get(field) or "") for field in ("matched-at", "host")} - {""}
+        for key, index in zip(matchers, scans_by_key):
+            scan_ids = list(dict.fromkeys(scan_id for host in hosts for scan_id in index.get(key(host), [])))
+            if scan_ids:
+                break
+        for scan_id in scan_ids:
+            per_scan[scan_id].append(finding)
+        if not scan_ids:
+            host = finding_host(finding) or "unknown"
+            unattributed[host] = unattributed.get(host, 0) + 1
+    if unattributed:
+        logger.warning(f"Batch {batch_id}: {sum(unattributed.values())} findings matched none of the targets and were dropped "
+                       f"(hosts: {', '.join(sorted(unattributed)[:5])})")
+    return per_scan
+
+def run_batch_job(batch_id: str, targets: List[Tuple[str, str]], mode: str = "quick", user_id: str = None):
+    """
+    Scan many targets while paying the Nuclei template load once per chunk:
+    concurrent Katana crawls, then one multi-target Nuclei run per chunk of
+    BATCH_TARGETS_PER_DETECTION targets, demultiplexed back into per-scan records.
+    """
+    logger.info(f"Starting batch {batch_id}: {len(targets)} targets (mode: {mode})")
+    # One trace per target, saved as soon as that target is reported
+    traces: Dict[str, ExitStack] = {}
+
+    def end_trace(scan_id: str):
+        if scan_id in traces:
+            traces.pop(scan_id).close()
+
+    target_urls = dict(targets)
+    batch_dir = os.path.join(RESULTS_DIR, "batches", batch_id)
+    passive: Dict[str, List[Future]] = {}
+    try:
+        for scan_id, url in targets:
+            traces[scan_id] = ExitStack()
+            traces[scan_id].enter_context(tracer.session(scan_id, save_trace))
+            traces[scan_id].enter_context(tracer.span(scan_id, "scan", "scan", target=url, mode=mode, batch_id=batch_id))
+            mark_running(scan_id, user_id)
+            passive[scan_id] = [start_passive_checks(scan_id, [url])]
+
+        # 1. DISCOVER all targets concurrently
+        endpoints_by_scan: Dict[str, List[str]] = {}
+        crawl_stats_by_scan: Dict[str, Dict[str, Any]] = {}
+        crawl_seconds: Dict[str, float] = {}
+
+        def crawl(scan_id: str, url: str) -> Tuple[List[str], Dict[str, Any]]:
+            # A target's deadline counts from its own crawl, not from the batch start
+            started = time.time()
+            job_store.update(scan_id, deadline_start=started)
             try:
-                supabase.table("scans").update({
-                    "status": "failed",
-                    "error_message": str(e),
-                    "completed_at": datetime.now().isoformat()
-                }).eq("scan_id", scan_id).execute()
-            except Exception as se:
-                logger.error(f"Failed to sync failure to Supabase: {se}")
+                with tracer.span(scan_id, "discovery"):
+                    return discover_endpoints(scan_id, url)
+            finally:
+                crawl_seconds[scan_id] = time.time() - started
+
+        # Concurrent crawls count as that many active scans
+        with tuner.scan_slot(min(len(targets), BATCH_DISCOVERY_WORKERS)):
+            with ThreadPoolExecutor(max_workers=BATCH_DISCOVERY_WORKERS, thread_name_prefix="snl-batch") as pool:
+                futures = {pool.submit(crawl, scan_id, url): (scan_id, url) for scan_id, url in targets}
+                for future, (scan_id, url) in futures.items():
+                    try:
+                        endpoints_by_scan[scan_id], crawl_stats_by_scan[scan_id] = future.result()
+                        save_checkpoint(scan_id, "discovered", crawl_stats=crawl_stats_by_scan[scan_id])
+                        passive[scan_id].append(check_discovered_pages(scan_id, url, endpoints_by_scan[scan_id]))
+                    except Exception as e:
+                        fail_scan(scan_id, e, user_id)
+                        end_trace(scan_id)
+
+        scan_ids = list(endpoints_by_scan)
+        for i in range(0, len(scan_ids), BATCH_TARGETS_PER_DETECTION):
+            chunk = scan_ids[i:i + BATCH_TARGETS_PER_DETECTION]
+            chunk_dir = os.path.join(batch_dir, str(i // BATCH_TARGETS_PER_DETECTION))
+            os.makedirs(chunk_dir, exist_ok=True)
+
+            # 2. DETECT: one Nuclei invocation for the whole chunk
+            # Waiting for the other targets' crawls does not use up a target's deadline
+            allotted = {}
+            for scan_id in chunk:
+                job = job_store.update(scan_id, deadline_start=time.time() - crawl_seconds.get(scan_id, 0))
+                allotted[scan_id] = ScanDeadline.for_job(job).allot("detection") if job else 0
+            detected = [scan_id for scan_id in chunk if allotted[scan_id] > 0]
+            skipped = {"templates_loaded": 0, "requests_sent": 0, "timed_out": True}
+            raw_findings, stats = [], skipped
+            if detected:
+                endpoints_file = os.path.join(chunk_dir, "endpoints.txt")
+                with open(endpoints_file, 'w') as f:
+                    for url in sorted({e for scan_id in detected for e in endpoints_by_scan[scan_id]}):
+                        f.write(url + "\n")
+                logger.info(f"Batch {batch_id}: detecting on {len(detected)} targets in one Nuclei run")
+                try:
+                    # The chunk stops when the tightest deadline in it is reached
+                    timeout = min(allotted[scan_id] for scan_id in detected)
+                    with ExitStack() as spans:
+                        for scan_id in detected:
+                            spans.enter_context(tracer.span(scan_id, "detection", batch_targets=len(detected)))
+                        with tuner.scan_slot():
+                            raw_findings, stats = detect(detected[0], endpoints_file, mode, chunk_dir, timeout=timeout, shared=True)
+                        # detect() traced the shared Nuclei run on the first target only
+                        timings = stats.get("timings") or {}
+                        for scan_id in detected[1:]:
+                            if timings.get("finished"):
+                                tracer.add(scan_id, "nuclei", timings["started"], timings["finished"], "external",
+                                           mode=mode, timeout=timeout, shared_with=detected[0])
+                            trace_nuclei_phases(scan_id, timings)
+                except Exception as e:
+                    for scan_id in detected:
+                        fail_scan(scan_id, e, user_id)
+                        end_trace(scan_id)
+                    chunk = [scan_id for scan_id in chunk if scan_id not in detected]
+                    detected = []
+            if len(detected) < len(chunk):
+                logger.warning(f"Batch {batch_id}: deadline reached before detection for {len(chunk) - len(detected)} targets. Reporting partial results.")
+
+            # 3. Demultiplex and finish each scan
+            per_scan = demux_findings(raw_findings, {scan_id: endpoints_by_scan[scan_id] for scan_id in detected}, batch_id)
+            for scan_id in chunk:
+                stats_for_scan = stats if scan_id in per_scan else skipped
+                per_scan.setdefault(scan_id, [])
+                try:
+                    with open(os.path.join(job_store.scan_dir(scan_id), "raw_findings.json"), 'w') as f:
+                        findings_parser.write_findings(per_scan[scan_id], f)
+                    with tracer.span(scan_id, "passive_checks.wait"):
+                        per_scan[scan_id] += record_passive_findings(scan_id, passive[scan_id])
+                    save_checkpoint(scan_id, "detected", stats=stats_for_scan)
+                    complete_scan(scan_id, target_urls[scan_id], endpoints_by_scan[scan_id], per_scan[scan_id], stats_for_scan, user_id, crawl_stats_by_scan[scan_id])
+                except Exception as e:
+                    fail_scan(scan_id, e, user_id)
+                end_trace(scan_id)
+    finally:
+        shutil.rmtree(batch_dir, ignore_errors=True)
+        for scan_id in list(traces):
+            end_trace(scan_id)
+    logger.info(f"Batch {batch_id} finished")
 
 @app.get("/")
 async def root():
@@ -240,154 +1066,358 @@ async def start_scan(request: ScanRequest, background_tasks: BackgroundTasks, us
     scan_id = str(uuid.uuid4())
     logger.info(f"User {user.id} queueing scan {scan_id} for {request.url}")
     
-    jobs[scan_id] = {
-        "scan_id": scan_id,
-        "user_id": user.id,
-        "target": str(request.url),
-        "mode": request.mode or "quick",
-        "status": "pending",
-        "submitted_at": datetime.now().isoformat(),
-        "result": None,
-        "error": None
-    }
-    save_history()
+    create_job(scan_id, user.id, str(request.url), request.mode or "quick",
+               crawl=request.crawl.model_dump() if request.crawl else None,
+               deadline_seconds=request.deadline_seconds)
+    job_store.save()
     
     # Write to Supabase (Initial Record)
-    if supabase:
+    if scans_repo.enabled:
         try:
-            supabase.table("scans").insert({
-                "scan_id": scan_id,
-                "user_id": user.id,
-                "target_url": str(request.url),
-                "scan_mode": request.mode or "quick",
-                "status": "pending"
-            }).execute()
+            await run_blocking(scans_repo.create_scan, scan_id, user.id, str(request.url), request.mode or "quick")
         except Exception as e:
             logger.error(f"Failed to create scan record in Supabase: {e}")
 
-    background_tasks.add_task(run_scan_job, scan_id, request.url, request.mode or "quick", user.id)
+    if request.force or not coalesce(scan_id, str(request.url), request.mode or "quick", user.id, background_tasks):
+        background_tasks.add_task(run_scan_job, scan_id, request.url, request.mode or "quick", user.id)
     
     return JobCreatedResponse(
         scan_id=scan_id,
         message="Scan started successfully."
     )
 
+@app.post("/scans/batch", response_model=BatchCreatedResponse)
+async def start_batch_scan(request: BatchScanRequest, background_tasks: BackgroundTasks, user: User = Depends(get_current_user)):
+    """Queue many targets as one batch: one scan record per target, shared Nuclei runs"""
+    batch_id = str(uuid.uuid4())
+    mode = request.mode or "quick"
+    targets = list(dict.fromkeys(str(url) for url in request.targets))
+    logger.info(f"User {user.id} queueing batch {batch_id} with {len(targets)} targets")
+
+    scans = []
+    for target in targets:
+        scan_id = str(uuid.uuid4())
+        create_job(scan_id, user.id, target, mode, batch_id=batch_id,
+                   crawl=request.crawl.model_dump() if request.crawl else None,
+                   deadline_seconds=request.deadline_seconds)
+        scans.append(BatchScanItem(scan_id=scan_id, target=target))
+    job_store.save()
+
+    # Write to Supabase (Initial Records)
+    if scans_repo.enabled:
+        try:
+            await run_blocking(scans_repo.create_scans, [
+                (item.scan_id, user.id, item.target, mode) for item in scans
+            ])
+        except Exception as e:
+            logger.error(f"Failed to create batch scan records in Supabase: {e}")
+
+    to_run = [(item.scan_id, item.target) for item in scans
+              if request.force or not coalesce(item.scan_id, item.target, mode, user.id, background_tasks)]
+    if to_run:
+        background_tasks.add_task(run_batch_job, batch_id, to_run, mode, user.id)
+
+    return BatchCreatedResponse(
+        batch_id=batch_id,
+        scans=scans,
+        message=f"Batch of {len(scans)} scans started successfully."
+    )
+
+def job_etag(job: Dict[str, Any], fields: Optional[List[str]] = None) -> str:
+    """Weak ETag for a job record (and the projection requested from it)"""
+    tag = f"{job['scan_id']}-v{job.get('version', 0)}"
+    if fields:
+        tag += "-" + ",".join(fields)
+    return f'W/"{tag}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Validate a `fields=` projection against ScanJobStatus"""
+    if not fields:
+        return None
+    selected = sorted({f.strip() for f in fields.split(",") if f.strip()})
+    unknown = [f for f in selected if f not in ScanJobStatus.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return selected
+
 @app.get("/scan/{scan_id}", response_model=ScanJobStatus)
-async def get_scan_status(scan_id: str):
-    if scan_id not in jobs:
+async def get_scan_status(scan_id: str, request: Request, fields: Optional[str] = None):
+    """
+    Poll a scan. Supports `fields=status,error` projection and
+    If-None-Match (304 Not Modified while the job has not changed).
+    """
+    job = job_store.get(scan_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Scan ID not found")
-    
-    job = jobs[scan_id]
-    
-    # Convert result dict back to model if it exists
-    result = None
-    if job.get("result"):
-        result = ScanResult(**job["result"])
-    
-    return ScanJobStatus(
-        scan_id=job["scan_id"],
-        status=job["status"],
-        target=job.get("target"),
-        submitted_at=job.get("submitted_at"),
-        result=result,
-        error=job.get("error")
-    )
 
-@app.get("/scans", response_model=List[ScanJobStatus])
-async def get_all_scans(user: User = Depends(get_current_user)):
-    """Get scan history for current user"""
+    selected = parse_fields(fields)
+    etag = job_etag(job, selected)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    # Stored results were validated when written, so serve them as-is
+    # instead of rebuilding the pydantic models on every poll.
+    body = {
+        "scan_id": job["scan_id"],
+        "status": job["status"],
+        "target": job.get("target"),
+        "submitted_at": job.get("submitted_at"),
+        "result": None,
+        "preliminary_findings": job.get("preliminary_findings"),
+        "ai_enrichment": job.get("ai_enrichment"),
+        "error": job.get("error")
+    }
+    if selected:
+        body = {k: v for k, v in body.items() if k == "scan_id" or k in selected}
+    if "result" in body and job.get("has_result"):
+        # Full results live in per-scan files and are only read when asked for
+        body["result"] = await run_blocking(job_store.get_result, scan_id)
+
+    return JSONResponse(body, headers=headers)
+
+def summarize_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """History row for a job: summary without findings"""
+    return {
+        "scan_id": job["scan_id"],
+        "status": job["status"],
+        "target": job.get("target"),
+        "submitted_at": job.get("submitted_at"),
+        "error": job.get("error"),
+        "summary": job.get("summary")
+    }
+
+def attach_results(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Load full results for history rows (view=full)"""
+    for item in items:
+        item["result"] = job_store.get_result(item["scan_id"])
+    return items
+
+@app.get("/scans", response_model=ScanHistoryPage)
+async def get_all_scans(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    view: str = Query("summary", pattern="^(summary|full)$"),
+    status: Optional[str] = Query(None, pattern="^(pending|running|completed|failed|cancelled)$"),
+    q: Optional[str] = Query(None, max_length=200),
+    user: User = Depends(get_current_user)
+):
+    """
+    Get one page of scan history for current user (newest first), optionally
+    filtered by status and a target substring (q). `totals` covers the whole history.
+    """
+    totals = job_store.totals_for_user(user.id)
     # 1. Try Supabase first
-    if supabase:
+    if scans_repo.enabled:
         try:
-            response = supabase.table("scans").select("*").eq("user_id", user.id).order("started_at", desc=True).execute()
-            db_scans = response.data
-            
-            history = []
-            for s in db_scans:
+            before = decode_cursor(cursor) if cursor else None
+            if before:
+                # both values are interpolated into a PostgREST filter, so only accept well-formed ones
+                datetime.fromisoformat(before[0].replace("Z", "+00:00"))
+                uuid.UUID(before[1])
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        try:
+            db_scans = await run_blocking(scans_repo.list_scans, user.id, limit + 1, before, status, q)
+
+            items = []
+            for s in db_scans[:limit]:
                 # Find in-memory job if available for real-time status
-                job = jobs.get(s["scan_id"])
-                
+                job = job_store.get(s["scan_id"])
                 if job:
-                    result_data = None
-                    if job.get("result"):
-                        try:
-                            result_data = ScanResult(**job["result"])
-                        except: pass
-                    
-                    history.append(ScanJobStatus(
-                        scan_id=job["scan_id"],
-                        status=job["status"],
-                        target=job.get("target"),
-                        submitted_at=job.get("submitted_at"),
-                        result=result_data,
-                        error=job.get("error")
-                    ))
+                    items.append(summarize_job(job))
                 else:
                     # Construct from DB data
-                    history.append(ScanJobStatus(
-                        scan_id=s["scan_id"],
-                        status=s["status"],
-                        target=s["target_url"],
-                        submitted_at=s.get("started_at"),
-                        result=None, 
-                        error=s.get("error_message")
-                    ))
-            return history
+                    items.append({
+                        "scan_id": s["scan_id"],
+                        "status": s["status"],
+                        "target": s["target_url"],
+                        "submitted_at": s.get("started_at"),
+                        "error": s.get("error_message")
+                    })
+
+            next_cursor = None
+            if len(db_scans) > limit:
+                last = db_scans[limit - 1]
+                next_cursor = encode_cursor((last.get("started_at") or "", last["scan_id"]))
+            if view == "full":
+                items = await run_blocking(attach_results, items)
+            return ScanHistoryPage(items=items, next_cursor=next_cursor, totals=totals)
         except Exception as e:
             logger.error(f"Supabase history fetch failed: {e}")
 
-    # 2. Fallback to JSON (Filtered by user_id)
-    result = []
-    for scan_id, job in jobs.items():
-        if job.get("user_id") != user.id:
-            continue
-            
-        scan_result = None
-        if job.get("result"):
-            try:
-                scan_result = ScanResult(**job["result"])
-            except:
-                pass
-        
-        result.append(ScanJobStatus(
-            scan_id=job["scan_id"],
-            status=job["status"],
-            target=job.get("target"),
-            submitted_at=job.get("submitted_at"),
-            result=scan_result,
-            error=job.get("error")
-        ))
-    
-    # Sort by submitted_at descending (newest first)
-    result.sort(key=lambda x: x.submitted_at or "", reverse=True)
-    return result
+    # 2. Fallback to the in-memory per-user index
+    try:
+        page, next_cursor = job_store.list_for_user(user.id, limit, cursor, status=status, query=q)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    items = [summarize_job(job) for job in page]
+    if view == "full":
+        items = await run_blocking(attach_results, items)
+    return ScanHistoryPage(items=items, next_cursor=next_cursor, totals=totals)
+
+@app.get("/scan/{scan_id}/diff", response_model=ScanDiff)
+async def get_scan_diff(scan_id: str, base: Optional[str] = None, user: User = Depends(get_current_user)):
+    """
+    New, fixed and regressed issues between two completed scans of the same target
+    (default base: the previous scan of that target). Cost depends on what changed
+    between the two scans, not on how many scans the target has.
+    """
+    job = job_store.get(scan_id)
+    base_job = job_store.get(base) if base else None
+    for j in (job, base_job) if base else (job,):
+        if j is None:
+            raise HTTPException(status_code=404, detail="Scan ID not found")
+        if j.get("user_id") != user.id:
+            raise HTTPException(status_code=403, detail="Not authorized to view this scan")
+        if j["status"] != "completed":
+            raise HTTPException(status_code=409, detail=f"Scan {j['scan_id']} is {j['status']}")
+
+    if base_job and FindingIndex.key(user.id, base_job["target"]) != FindingIndex.key(user.id, job["target"]):
+        raise HTTPException(status_code=400, detail="Scans are of different targets")
+    if base is None:
+        base = await run_blocking(findings_index.previous, user.id, job["target"], scan_id)
+        if base is None:
+            raise HTTPException(status_code=404, detail="No earlier scan of this target")
+
+    try:
+        return await run_blocking(findings_index.diff, user.id, job["target"], base, scan_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"Findings of scan {e.args[0]} are not indexed")
+
+@app.get("/scan/{scan_id}/export")
+async def export_scan(
+    scan_id: str,
+    format: str = Query("ndjson", pattern="^(ndjson|csv|sarif)$"),
+    findings: str = Query("raw", pattern="^(raw|prioritized)$"),
+    user: User = Depends(get_current_user)
+):
+    """
+    Download a completed scan's findings as NDJSON, CSV or SARIF 2.1.0.
+    findings=raw: every Nuclei and passive check finding, streamed from the stored
+    raw findings file, so memory stays flat however many there are.
+    findings=prioritized: the report (top issues with remediation text).
+    """
+    job = job_store.get(scan_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Scan ID not found")
+    if job.get("user_id") != user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to export this scan")
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Scan is {job['status']}")
+
+    if findings == "raw":
+        body = exporters.export(format, raw_lines=iter_stored_findings(scan_id), run_id=f"snl/{scan_id}")
+    else:
+        result = await run_blocking(job_store.get_result, scan_id)
+        if result is None:
+            raise HTTPException(status_code=404, detail="Scan result is no longer available")
+        body = exporters.export(format, report=result.get("findings", []), run_id=f"snl/{scan_id}")
+
+    # Read the first chunk now so a missing file is a 404, not a truncated download
+    try:
+        first = await run_blocking(next, body, None)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Raw findings are no longer available")
+
+    media_type, extension = exporters.FORMATS[format]
+    filename = f"snl-{scan_id}-{findings}.{extension}"
+    return StreamingResponse(
+        itertools.chain([first] if first else [], body),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.get("/scan/{scan_id}/trace")
+async def get_scan_trace(scan_id: str, user: User = Depends(get_current_user)):
+    """
+    Timeline of a scan's stages and external calls (Katana, Nuclei, passive checks,
+    OpenAI, Supabase) as a Chrome trace file: open it in chrome://tracing or
+    ui.perfetto.dev. Includes sampled Python stacks when SNL_TRACE_PROFILE=1.
+    """
+    job = job_store.get(scan_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Scan ID not found")
+    if job.get("user_id") != user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to view this scan")
+
+    # Coalesced scans were executed (and traced) by the scan they attached to;
+    # they get their own copy of its trace once it is finished
+    source_id = job.get("coalesced_with") or scan_id
+
+    def load_trace() -> Optional[Dict[str, Any]]:
+        try:
+            with job_store.open_scan_file(stored_file_source(scan_id, "trace.json"), "trace.json") as f:
+                return findings_parser.load(f)
+        except FileNotFoundError:
+            return None
+
+    trace = await run_blocking(load_trace)
+    active = tracer.get(source_id)
+    if active is not None:
+        # Still running: spans finished so far
+        events = (trace or {}).get("traceEvents", []) + active.chrome_events()
+        trace = chrome_trace(source_id, events, profiled=active.profiled, in_progress=True)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="No trace recorded for this scan")
+    return JSONResponse(trace, headers={"Content-Disposition": f'attachment; filename="snl-{scan_id}.trace.json"'})
 
 @app.delete("/scan/{scan_id}")
-async def delete_scan(scan_id: str, user: User = Depends(get_current_user)):
-    """Delete a scan from history (user must own it)"""
-    if scan_id not in jobs:
+async def delete_scan(scan_id: str, background_tasks: BackgroundTasks, user: User = Depends(get_current_user)):
+    """
+    Delete a scan from history (user must own it). Its Katana/Nuclei run is stopped;
+    scans coalesced onto it are handed on: the first becomes the executing scan, the
+    rest attach to it.
+    """
+    if scan_id not in job_store:
         # Check DB if not in memory
-        if supabase:
+        if scans_repo.enabled:
             try:
-                check = supabase.table("scans").select("user_id").eq("scan_id", scan_id).execute()
-                if not check.data or check.data[0]["user_id"] != user.id:
+                owner = await run_blocking(scans_repo.get_owner, scan_id)
+                if owner != user.id:
                     raise HTTPException(status_code=403, detail="Not authorized to delete this scan")
-                supabase.table("scans").delete().eq("scan_id", scan_id).execute()
+                await run_blocking(scans_repo.delete_scan, scan_id)
                 return {"message": "Scan deleted successfully", "scan_id": scan_id}
+            except HTTPException:
+                raise
             except Exception as e:
                 logger.error(f"Failed to delete from Supabase: {e}")
         
         raise HTTPException(status_code=404, detail="Scan ID not found")
     
-    if jobs[scan_id].get("user_id") != user.id:
+    if job_store.get(scan_id).get("user_id") != user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this scan")
     
-    del jobs[scan_id]
-    save_history()
-    
-    if supabase:
+    followers = coalescer.abandon(scan_id)
+    await run_blocking(job_store.delete, scan_id)
+    coalescer.forget(scan_id)
+    # Stop the deleted scan's own run before a follower starts scanning the target again
+    background_tasks.add_task(stop_execution, scan_id)
+    for follower_id, _ in followers:
+        job = job_store.get(follower_id)
+        if job is not None and job["status"] not in ("cancelled", "failed", "completed"):
+            logger.info(f"Scan {follower_id} no longer attached to deleted scan {scan_id}")
+            rejoin_scan(job, background_tasks.add_task)
+    job_store.save()
+
+    if scans_repo.enabled:
         try:
-            supabase.table("scans").delete().eq("scan_id", scan_id).execute()
+            await run_blocking(scans_repo.delete_scan, scan_id)
         except: pass
     
     return {"message": "Scan deleted successfully", "scan_id": scan_id}
@@ -395,25 +1425,26 @@ async def delete_scan(scan_id: str, user: User = Depends(get_current_user)):
 @app.post("/scan/{scan_id}/cancel")
 async def cancel_scan(scan_id: str, user: User = Depends(get_current_user)):
     """Cancel a running scan (user must own it)"""
-    if scan_id not in jobs:
+    job = job_store.get(scan_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Scan ID not found")
-    
-    job = jobs[scan_id]
+
     if job.get("user_id") != user.id:
         raise HTTPException(status_code=403, detail="Not authorized to cancel this scan")
 
     if job["status"] in ["pending", "running"]:
-        job["status"] = "cancelled"
-        job["error"] = "Scan was cancelled by user"
-        save_history()
+        job_store.update(scan_id, status="cancelled", error="Scan was cancelled by user")
+        job_store.save()
         
-        if supabase:
+        if scans_repo.enabled:
             try:
-                supabase.table("scans").update({
-                    "status": "cancelled",
-                    "error_message": "Scan was cancelled by user",
-                    "completed_at": datetime.now().isoformat()
-                }).eq("scan_id", scan_id).execute()
+                await run_blocking(
+                    scans_repo.update_scan,
+                    scan_id,
+                    status="cancelled",
+                    error_message="Scan was cancelled by user",
+                    completed_at=datetime.now().isoformat()
+                )
             except: pass
             
         logger.info(f"Scan {scan_id} cancelled by user {user.id}")
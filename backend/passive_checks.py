@@ -0,0 +1,245 @@
+import ssl
+import socket
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import List, Dict, Any
+from urllib.parse import urlsplit
+
+import httpx
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class PassiveChecksLayer:
+    """
+    Level 1.5: Passive Checks (in-process, async).
+    - Security headers, cookie flags, TLS version/certificate, CORS, HTTPS redirect.
+    - One or two plain requests per page; no payloads.
+    - Findings use the Nuclei JSON shape so FilteringLayer can rank them with the rest.
+    """
+
+    TIMEOUT = 10
+    MAX_CONCURRENCY = 10
+    CERT_EXPIRY_WARNING_DAYS = 30
+    CORS_PROBE_ORIGIN = "https://snl-cors-probe.invalid"
+    USER_AGENT = "SNL-PassiveChecks/1.0"
+
+    # header -> (template-id, name, severity, tags, remediation)
+    SECURITY_HEADERS = {
+        "strict-transport-security": ("snl-missing-hsts", "Missing Strict-Transport-Security Header", "low", ["header", "hsts"],
+                                      "Send Strict-Transport-Security: max-age=31536000; includeSubDomains on HTTPS responses."),
+        "content-security-policy": ("snl-missing-csp", "Missing Content-Security-Policy Header", "low", ["header", "csp"],
+                                    "Define a Content-Security-Policy that restricts script, style and frame sources."),
+        "x-frame-options": ("snl-missing-x-frame-options", "Missing X-Frame-Options Header", "info", ["header", "clickjacking"],
+                            "Send X-Frame-Options: DENY (or CSP frame-ancestors 'none')."),
+        "x-content-type-options": ("snl-missing-x-content-type-options", "Missing X-Content-Type-Options Header", "info", ["header"],
+                                   "Send X-Content-Type-Options: nosniff."),
+        "referrer-policy": ("snl-missing-referrer-policy", "Missing Referrer-Policy Header", "info", ["header"],
+                            "Send Referrer-Policy: strict-origin-when-cross-origin."),
+    }
+
+    async def run(self, urls: List[str], host_checks: bool = True) -> List[Dict[str, Any]]:
+        """
+        Run page checks (headers, cookies) on every URL and, when host_checks is set,
+        per-host checks (TLS, certificate, CORS, HTTPS redirect) once per host.
+        """
+        # Per run: the layer is shared by scans running on different event loops
+        sem = asyncio.Semaphore(self.MAX_CONCURRENCY)
+        hosts = {}
+        for url in urls:
+            parts = urlsplit(url)
+            hosts.setdefault((parts.scheme, parts.hostname, parts.port), url)
+
+        async with httpx.AsyncClient(
+            timeout=self.TIMEOUT,
+            follow_redirects=True,
+            verify=False,  # certificate problems are reported by the TLS check instead
+            headers={"User-Agent": self.USER_AGENT}
+        ) as client:
+            tasks = [self._check_page(client, sem, url) for url in urls]
+            if host_checks:
+                for (scheme, hostname, port), url in hosts.items():
+                    tasks.append(self._check_cors(client, sem, url))
+                    if scheme == "https" and hostname:
+                        tasks.append(self._check_tls(sem, hostname, port or 443))
+                        tasks.append(self._check_https_redirect(client, sem, url))
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        findings = []
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning(f"Passive check failed: {result}")
+                continue
+            findings.extend(result)
+
+        # One finding per template per host is enough signal
+        unique = {}
+        for f in findings:
+            key = (f["template-id"], urlsplit(f["matched-at"]).netloc)
+            unique.setdefault(key, f)
+        logger.info(f"Passive checks complete. {len(unique)} findings on {len(urls)} URLs.")
+        return list(unique.values())
+
+    # -----------------
+    # Page checks
+    # -----------------
+    async def _check_page(self, client: httpx.AsyncClient, sem: asyncio.Semaphore, url: str) -> List[Dict[str, Any]]:
+        async with sem:
+            response = await client.get(url)
+        findings = []
+        final_url = str(response.url)
+        is_https = response.url.scheme == "https"
+
+        for header, (template_id, name, severity, tags, remediation) in self.SECURITY_HEADERS.items():
+            if header == "strict-transport-security" and not is_https:
+                continue
+            if header == "x-frame-options" and "frame-ancestors" in response.headers.get("content-security-policy", ""):
+                continue
+            if header not in response.headers:
+                findings.append(self._finding(template_id, name, severity, tags, final_url,
+                                              f"The response does not include the {header} header.", remediation))
+
+        for cookie in response.headers.get_list("set-cookie"):
+            cookie_name = cookie.split("=", 1)[0].strip()
+            attributes = [a.strip().lower() for a in cookie.split(";")[1:]]
+            missing = []
+            if is_https and "secure" not in attributes:
+                missing.append("Secure")
+            if "httponly" not in attributes:
+                missing.append("HttpOnly")
+            if not any(a.startswith("samesite") for a in attributes):
+                missing.append("SameSite")
+            if missing:
+                findings.append(self._finding(
+                    "snl-cookie-missing-flags", "Cookie Without Security Flags", "low", ["cookie", "header"], final_url,
+                    f"Cookie '{cookie_name}' is set without: {', '.join(missing)}.",
+                    "Set cookies with Secure, HttpOnly and SameSite=Lax (or Strict).",
+                    extracted=[f"{cookie_name}: {', '.join(missing)}"]
+                ))
+        return findings
+
+    # -----------------
+    # Host checks
+    # -----------------
+    async def _check_cors(self, client: httpx.AsyncClient, sem: asyncio.Semaphore, url: str) -> List[Dict[str, Any]]:
+        async with sem:
+            response = await client.get(url, headers={"Origin": self.CORS_PROBE_ORIGIN})
+        allow_origin = response.headers.get("access-control-allow-origin")
+        allow_credentials = response.headers.get("access-control-allow-credentials", "").lower() == "true"
+        if allow_origin == self.CORS_PROBE_ORIGIN:
+            severity = "high" if allow_credentials else "medium"
+            return [self._finding(
+                "snl-cors-reflected-origin", "CORS Reflects Arbitrary Origin", severity, ["cors", "misconfig"], str(response.url),
+                "Access-Control-Allow-Origin echoes any Origin" + (" with credentials allowed." if allow_credentials else "."),
+                "Only allow a fixed list of trusted origins in Access-Control-Allow-Origin.",
+                extracted=[allow_origin]
+            )]
+        if allow_origin == "*":
+            return [self._finding(
+                "snl-cors-wildcard", "CORS Allows Any Origin", "info", ["cors", "misconfig"], str(response.url),
+                "Access-Control-Allow-Origin is '*', so any site can read these responses.",
+                "Restrict Access-Control-Allow-Origin to trusted origins unless the content is public.",
+                extracted=[allow_origin]
+            )]
+        return []
+
+    async def _check_https_redirect(self, client: httpx.AsyncClient, sem: asyncio.Semaphore, url: str) -> List[Dict[str, Any]]:
+        http_url = "http://" + url.split("://", 1)[1]
+        try:
+            async with sem:
+                response = await client.get(http_url)
+        except httpx.HTTPError:
+            return []  # plain HTTP not served at all
+        if response.url.scheme != "https":
+            return [self._finding(
+                "snl-no-https-redirect", "HTTP Not Redirected to HTTPS", "low", ["tls", "redirect"], http_url,
+                "The site is reachable over plain HTTP without being redirected to HTTPS.",
+                "Redirect all HTTP requests to HTTPS (301) and enable HSTS."
+            )]
+        return []
+
+    async def _check_tls(self, sem: asyncio.Semaphore, hostname: str, port: int) -> List[Dict[str, Any]]:
+        findings = []
+        matched_at = f"{hostname}:{port}"
+
+        # Certificate validity (chain, hostname, expiry) with a verifying context
+        try:
+            cert, version = await self._handshake(sem, hostname, port, ssl.create_default_context())
+            not_after = datetime.fromtimestamp(ssl.cert_time_to_seconds(cert["notAfter"]), tz=timezone.utc)
+            days_left = (not_after - datetime.now(timezone.utc)).days
+            if days_left < self.CERT_EXPIRY_WARNING_DAYS:
+                findings.append(self._finding(
+                    "snl-tls-cert-expiring", "TLS Certificate Expiring Soon", "medium", ["ssl", "tls"], matched_at,
+                    f"The certificate expires in {days_left} days ({not_after.date()}).",
+                    "Renew the certificate and automate renewal (e.g. ACME).",
+                    extracted=[str(not_after.date())]
+                ))
+        except ssl.SSLCertVerificationError as e:
+            findings.append(self._finding(
+                "snl-tls-cert-invalid", "Invalid TLS Certificate", "high", ["ssl", "tls"], matched_at,
+                f"The certificate failed verification: {e.verify_message}.",
+                "Serve a certificate from a trusted CA that matches the hostname and has not expired.",
+                extracted=[str(e.verify_message)]
+            ))
+
+        # Deprecated protocol versions
+        legacy = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        legacy.check_hostname = False
+        legacy.verify_mode = ssl.CERT_NONE
+        try:
+            legacy.minimum_version = ssl.TLSVersion.TLSv1
+            legacy.maximum_version = ssl.TLSVersion.TLSv1_1
+            legacy.set_ciphers("DEFAULT:@SECLEVEL=0")
+            _, version = await self._handshake(sem, hostname, port, legacy)
+            findings.append(self._finding(
+                "snl-tls-deprecated-version", "Deprecated TLS Version Supported", "medium", ["ssl", "tls"], matched_at,
+                f"The server accepts {version}, which is deprecated.",
+                "Disable TLS 1.0 and 1.1; allow only TLS 1.2 and 1.3.",
+                extracted=[version]
+            ))
+        except (ssl.SSLError, ValueError, OSError):
+            pass  # refused (good) or not supported by the local OpenSSL build
+        return findings
+
+    async def _handshake(self, sem: asyncio.Semaphore, hostname: str, port: int, context: ssl.SSLContext):
+        async with sem:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(hostname, port, ssl=context, server_hostname=hostname),
+                timeout=self.TIMEOUT
+            )
+        try:
+            ssl_object = writer.get_extra_info("ssl_object")
+            return ssl_object.getpeercert(), ssl_object.version()
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ssl.SSLError, ConnectionError, socket.error):
+                pass
+
+    @staticmethod
+    def _finding(template_id: str, name: str, severity: str, tags: List[str], matched_at: str,
+                 description: str, remediation: str, extracted: List[str] = None) -> Dict[str, Any]:
+        finding = {
+            "template-id": template_id,
+            "type": "http",
+            "host": matched_at,
+            "matched-at": matched_at,
+            "info": {
+                "name": name,
+                "severity": severity,
+                "tags": tags,
+                "description": description,
+                "remediation": remediation
+            },
+            "source": "passive"
+        }
+        if extracted:
+            finding["extracted-results"] = extracted
+        return finding
+
+if __name__ == "__main__":
+    # Test run
+    # print(asyncio.run(PassiveChecksLayer().run(["https://example.com"])))
+    pass
@@ -0,0 +1,122 @@
+import ssl
+import time
+import socket
+import asyncio
+import logging
+from typing import Dict, Any
+from urllib.parse import urlsplit
+
+import httpx
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class PreflightError(Exception):
+    """The target cannot be scanned (unresolvable, unreachable or not speaking HTTP)"""
+
+class PreflightLayer:
+    """
+    Level 0: Target Preflight (async, a few seconds at most).
+    - DNS resolution, TCP connect, TLS handshake (https), HTTP response and redirect chain.
+    - Dead targets fail here instead of after a full Katana crawl budget.
+    - The URL the redirects end at is what gets crawled, as long as it is on the
+      submitted host (scheme, port and "www." may change). Off-site redirects are
+      recorded but never followed into the scan.
+    - Certificate problems don't fail the preflight; the passive TLS check reports them.
+    """
+
+    TIMEOUT = 10
+    MAX_REDIRECTS = 10
+    USER_AGENT = "SNL-Preflight/1.0"
+
+    async def check(self, target_url: str) -> Dict[str, Any]:
+        start = time.time()
+        parts = urlsplit(target_url)
+        hostname = parts.hostname
+        if not hostname:
+            raise PreflightError(f"Invalid target URL: {target_url}")
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+
+        # 1. DNS
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await asyncio.wait_for(loop.getaddrinfo(hostname, port, type=socket.SOCK_STREAM), self.TIMEOUT)
+        except (socket.gaierror, asyncio.TimeoutError) as e:
+            raise PreflightError(f"Target unreachable: DNS lookup failed for {hostname} ({self._reason(e)})")
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+
+        # 2. TCP connect (+ 3. TLS handshake for https)
+        tls_version = None
+        context = None
+        if parts.scheme == "https":
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(hostname, port, ssl=context, server_hostname=hostname if context else None),
+                self.TIMEOUT
+            )
+        except ssl.SSLError as e:
+            raise PreflightError(f"Target unreachable: TLS handshake with {hostname}:{port} failed ({self._reason(e)})")
+        except (OSError, asyncio.TimeoutError) as e:
+            raise PreflightError(f"Target unreachable: TCP connection to {hostname}:{port} failed ({self._reason(e)})")
+        if context:
+            tls_version = writer.get_extra_info("ssl_object").version()
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (ssl.SSLError, OSError):
+            pass
+
+        # 4. HTTP response and redirect chain
+        try:
+            async with httpx.AsyncClient(
+                timeout=self.TIMEOUT,
+                follow_redirects=True,
+                max_redirects=self.MAX_REDIRECTS,
+                verify=False,
+                headers={"User-Agent": self.USER_AGENT}
+            ) as client:
+                async with client.stream("GET", target_url) as response:
+                    redirects = [{"url": str(r.url), "status_code": r.status_code} for r in response.history]
+                    final_url = str(response.url)
+                    status_code = response.status_code
+        except httpx.TooManyRedirects:
+            raise PreflightError(f"Target unreachable: more than {self.MAX_REDIRECTS} redirects from {target_url}")
+        except httpx.HTTPError as e:
+            raise PreflightError(f"Target unreachable: no HTTP response from {target_url} ({self._reason(e)})")
+
+        offsite = None if self.same_host(target_url, final_url) else final_url
+        if offsite:
+            logger.warning(f"Preflight: {target_url} redirects off-site to {offsite}; scanning the submitted URL")
+        result = {
+            "final_url": final_url,
+            "offsite_redirect": offsite,
+            "status_code": status_code,
+            "redirects": redirects,
+            "addresses": addresses,
+            "tls_version": tls_version,
+            "elapsed_seconds": round(time.time() - start, 2)
+        }
+        logger.info(f"Preflight OK for {target_url}: HTTP {status_code} at {final_url} ({len(redirects)} redirects, {result['elapsed_seconds']}s)")
+        return result
+
+    @staticmethod
+    def same_host(target_url: str, url: str) -> bool:
+        """Whether url is on the target's host, ignoring scheme, port and a leading "www." """
+        def host(u: str) -> str:
+            name = (urlsplit(u).hostname or "").lower()
+            return name[4:] if name.startswith("www.") else name
+        return host(target_url) == host(url)
+
+    @staticmethod
+    def _reason(error: Exception) -> str:
+        if isinstance(error, asyncio.TimeoutError):
+            return "timed out"
+        return str(error) or error.__class__.__name__
+
+if __name__ == "__main__":
+    # Test run
+    # print(asyncio.run(PreflightLayer().check("https://example.com")))
+    pass
@@ -0,0 +1,89 @@
+import os
+import json
+import logging
+from typing import List, Dict, Any, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_KB_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "remediation_kb.json")
+
+class RemediationLayer:
+    """
+    Level 4a: Offline Remediation.
+    - Deterministic report text from Nuclei template metadata (description, remediation, reference).
+    - Gaps are filled from a local knowledge base (remediation_kb.json): template-id, then tags, then severity.
+    - No network calls; the report is ready as soon as filtering is done.
+    - Output has the same shape as AIInterpretationLayer.interpret.
+    """
+
+    MAX_REFERENCES = 3
+
+    def __init__(self, kb_file: str = None):
+        self.kb_file = kb_file or os.getenv("SNL_REMEDIATION_KB", DEFAULT_KB_FILE)
+        self.kb = self._load_kb(self.kb_file)
+
+    @staticmethod
+    def _load_kb(path: str) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(path, 'r') as f:
+                kb = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Could not load remediation knowledge base {path}: {e}")
+            kb = {}
+        return {section: kb.get(section, {}) for section in ("templates", "tags", "severity")}
+
+    def interpret(self, prioritized_findings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        report = [self.explain(f) for f in prioritized_findings]
+        logger.info(f"Offline remediation complete for {len(report)} findings.")
+        return report
+
+    def explain(self, finding: Dict[str, Any]) -> Dict[str, Any]:
+        info = finding.get("info") or {}
+        template_id = finding.get("template-id") or "unknown"
+        severity = (info.get("severity") or "info").lower()
+        name = info.get("name") or template_id.replace("-", " ").title()
+        entry = self.lookup(template_id, info.get("tags"), severity)
+
+        description = (info.get("description") or "").strip()
+        what_is_wrong = description or f"{name} was detected at {finding.get('matched-at', 'the target')}."
+        if finding.get("matcher-name"):
+            what_is_wrong += f" (matched: {finding['matcher-name']})"
+
+        return {
+            "id": template_id,
+            "name": name,
+            "severity": severity,
+            "url": finding.get("matched-at"),
+            "interpretation": {
+                "what_is_wrong": what_is_wrong,
+                "why_it_matters": entry.get("why_it_matters", "Security risk detected."),
+                "how_to_fix": (info.get("remediation") or "").strip() or entry.get("how_to_fix", "Review the finding and the references below."),
+                "references": self._references(info.get("reference"))
+            },
+            "interpretation_source": "offline"
+        }
+
+    def lookup(self, template_id: str, tags: Optional[Any], severity: str) -> Dict[str, str]:
+        """Knowledge base entry: exact template, then the first known tag, then severity"""
+        if template_id in self.kb["templates"]:
+            return self.kb["templates"][template_id]
+        if isinstance(tags, str):
+            tags = tags.split(",")
+        for tag in tags or []:
+            tag = tag.strip().lower()
+            if tag in self.kb["tags"]:
+                return self.kb["tags"][tag]
+        return self.kb["severity"].get(severity, {})
+
+    def _references(self, reference: Optional[Any]) -> List[str]:
+        if not reference:
+            return []
+        if isinstance(reference, str):
+            reference = reference.split()
+        return [r for r in reference if isinstance(r, str) and r.startswith("http")][:self.MAX_REFERENCES]
+
+if __name__ == "__main__":
+    # Test run
+    # print(RemediationLayer().interpret([{"template-id": "php-detect", "info": {"severity": "info"}}]))
+    pass
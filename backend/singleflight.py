@@ -0,0 +1,103 @@
+import time
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def normalize_target(url: str) -> str:
+    """
+    Canonical form of a target URL for coalescing:
+    lower-case scheme/host, no default port, no fragment, sorted query, "/" for an empty path.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+def scan_key(url: str, mode: str) -> str:
+    return f"{mode}|{normalize_target(url)}"
+
+class ScanCoalescer:
+    """
+    Single-flight registry for scans.
+    - The first request for a key leads and executes the scan.
+    - Identical requests while it runs attach as followers (own scan_id, shared execution).
+    - A successful leader stays attachable for `recent_window` seconds after it finishes.
+    """
+
+    def __init__(self, recent_window: float = 300):
+        self.recent_window = recent_window
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, str] = {}            # key -> leader scan_id
+        self._keys: Dict[str, str] = {}                # leader scan_id -> key
+        self._followers: Dict[str, List[Tuple[str, Optional[str]]]] = {}  # leader -> [(scan_id, user_id)]
+        self._recent: Dict[str, Tuple[str, float]] = {}  # key -> (leader scan_id, finished_at)
+
+    def join(self, key: str, scan_id: str, user_id: Optional[str] = None) -> Tuple[Optional[str], bool]:
+        """
+        Register a request. Returns (leader_id, in_flight):
+        - (None, False): no match, this scan leads and must be executed.
+        - (leader, True): attached to a running scan; its outcome is fanned out later.
+        - (leader, False): an identical scan finished recently; reuse its result now.
+        """
+        with self._lock:
+            leader = self._inflight.get(key)
+            if leader:
+                self._followers[leader].append((scan_id, user_id))
+                return leader, True
+
+            recent = self._recent.get(key)
+            if recent and time.time() - recent[1] <= self.recent_window:
+                return recent[0], False
+
+            self._inflight[key] = scan_id
+            self._keys[scan_id] = key
+            self._followers[scan_id] = []
+            return None, False
+
+    def finish(self, leader: str, succeeded: bool) -> List[Tuple[str, Optional[str]]]:
+        """Close a leader's flight and return the followers waiting on it"""
+        with self._lock:
+            key = self._keys.pop(leader, None)
+            if key is None:
+                return []
+            if self._inflight.get(key) == leader:
+                del self._inflight[key]
+            if succeeded:
+                self._recent[key] = (leader, time.time())
+            self._prune_recent()
+            return self._followers.pop(leader, [])
+
+    def abandon(self, leader: str) -> List[Tuple[str, Optional[str]]]:
+        """
+        Close a leader's flight without an outcome (e.g. it was deleted while running)
+        and return its followers, which have to be executed or attached again.
+        """
+        with self._lock:
+            key = self._keys.pop(leader, None)
+            if key is None:
+                return []
+            if self._inflight.get(key) == leader:
+                del self._inflight[key]
+            return self._followers.pop(leader, [])
+
+    def forget(self, scan_id: str):
+        """Drop a scan from the recent cache (e.g. when it is deleted)"""
+        with self._lock:
+            for key, (leader, _) in list(self._recent.items()):
+                if leader == scan_id:
+                    del self._recent[key]
+
+    def _prune_recent(self):
+        cutoff = time.time() - self.recent_window
+        for key, (_, finished_at) in list(self._recent.items()):
+            if finished_at < cutoff:
+                del self._recent[key]
@@ -0,0 +1,218 @@
+import os
+import sys
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Sampled stacks are drawn on their own track next to the thread's spans
+SAMPLE_TID_OFFSET = 1_000_000
+
+def _us(seconds: float) -> int:
+    return int(seconds * 1_000_000)
+
+class Trace:
+    """
+    Spans of one scan in Chrome trace event format (complete "X" events, microseconds).
+    - Spans may be recorded from any thread; nesting follows from their timestamps per thread.
+    - With profile=True a sampler thread walks the stacks of the threads currently
+      inside one of this trace's spans and records them as a flame chart.
+    """
+
+    MAX_EVENTS = 200_000
+    MAX_STACK_DEPTH = 64
+
+    def __init__(self, scan_id: str, profile: bool = False, interval: float = 0.01):
+        self.scan_id = scan_id
+        self.pid = os.getpid()
+        self.events: List[Dict[str, Any]] = []
+        self.truncated = False
+        self.profiled = profile
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._threads: Dict[int, Tuple[int, str]] = {}  # ident -> (native id, name)
+        self._active: Dict[int, int] = {}              # ident -> open spans
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        if profile:
+            self._sampler = threading.Thread(target=self._sample_loop, name=f"snl-profiler-{scan_id[:8]}", daemon=True)
+            self._sampler.start()
+
+    def _record(self, event: Dict[str, Any]):
+        with self._lock:
+            if len(self.events) >= self.MAX_EVENTS:
+                self.truncated = True
+                return
+            self.events.append(event)
+
+    def _thread(self) -> int:
+        ident = threading.get_ident()
+        if ident not in self._threads:
+            self._threads[ident] = (threading.get_native_id(), threading.current_thread().name)
+        return self._threads[ident][0]
+
+    @contextmanager
+    def span(self, name: str, cat: str = "stage", **args):
+        """Time the block. Yields the span's args dict so results can be attached to it."""
+        ident = threading.get_ident()
+        with self._lock:
+            tid = self._thread()
+            self._active[ident] = self._active.get(ident, 0) + 1
+        start = time.time()
+        try:
+            yield args
+        except BaseException as e:
+            args["error"] = f"{e.__class__.__name__}: {e}"
+            raise
+        finally:
+            end = time.time()
+            with self._lock:
+                self._active[ident] -= 1
+            self._record({"name": name, "cat": cat, "ph": "X", "ts": _us(start), "dur": _us(end - start),
+                          "pid": self.pid, "tid": tid, "args": args})
+
+    def add(self, name: str, start: float, end: float, cat: str = "stage", **args):
+        """Record a span measured elsewhere (epoch seconds), on the calling thread"""
+        with self._lock:
+            tid = self._thread()
+        self._record({"name": name, "cat": cat, "ph": "X", "ts": _us(start), "dur": _us(max(0.0, end - start)),
+                      "pid": self.pid, "tid": tid, "args": args})
+
+    def close(self):
+        if self._sampler:
+            self._stop.set()
+            self._sampler.join()
+
+    def chrome_events(self) -> List[Dict[str, Any]]:
+        """Recorded events plus process/thread name metadata"""
+        with self._lock:
+            events = list(self.events)
+            threads = list(self._threads.values())
+        meta = [{"name": "process_name", "ph": "M", "pid": self.pid, "tid": 0, "args": {"name": f"SNL backend (pid {self.pid})"}}]
+        for tid, name in threads:
+            meta.append({"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}})
+            if self.profiled:
+                meta.append({"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid + SAMPLE_TID_OFFSET, "args": {"name": f"{name} (sampled)"}})
+        return meta + events
+
+    # -----------------
+    # Sampling profiler
+    # -----------------
+    def _sample_loop(self):
+        open_stacks: Dict[int, List[Tuple[str, float]]] = {}  # ident -> [(frame, since)], root first
+        while not self._stop.wait(self.interval):
+            now = time.time()
+            frames = sys._current_frames()
+            with self._lock:
+                sampled = [ident for ident, depth in self._active.items() if depth > 0]
+            for ident in sampled:
+                self._fold(ident, open_stacks.setdefault(ident, []), self._stack(frames.get(ident)), now)
+            for ident in [i for i in open_stacks if i not in sampled]:
+                self._fold(ident, open_stacks.pop(ident), [], now)
+        now = time.time()
+        for ident, stack in open_stacks.items():
+            self._fold(ident, stack, [], now)
+
+    def _stack(self, frame) -> List[str]:
+        stack = []
+        while frame is not None and len(stack) < self.MAX_STACK_DEPTH:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    def _fold(self, ident: int, open_stack: List[Tuple[str, float]], stack: List[str], now: float):
+        """Close the frames that left the stack since the last sample and open the new ones"""
+        common = 0
+        while common < len(open_stack) and common < len(stack) and open_stack[common][0] == stack[common]:
+            common += 1
+        tid = self._threads.get(ident, (ident, ""))[0] + SAMPLE_TID_OFFSET
+        for frame, since in reversed(open_stack[common:]):
+            self._record({"name": frame, "cat": "sample", "ph": "X", "ts": _us(since), "dur": _us(now - since),
+                          "pid": self.pid, "tid": tid})
+        del open_stack[common:]
+        open_stack.extend((frame, now) for frame in stack[common:])
+
+class Tracer:
+    """
+    Per-scan traces, looked up by scan_id so every layer call can add spans.
+    - start()/finish() are reference counted: a scan's pipeline and its background
+      AI enrichment share one trace, and the last one to finish gets the events.
+    - SNL_TRACING=0 turns spans into no-ops; SNL_TRACE_PROFILE=1 adds the sampling profiler.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("SNL_TRACING", "1") != "0"
+        self.profile = os.getenv("SNL_TRACE_PROFILE", "0") == "1"
+        self.interval = float(os.getenv("SNL_TRACE_PROFILE_INTERVAL_MS", "10")) / 1000
+        self._traces: Dict[str, Tuple[Trace, int]] = {}
+        self._lock = threading.Lock()
+
+    def start(self, scan_id: str) -> Optional[Trace]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            trace, refs = self._traces.get(scan_id) or (None, 0)
+            if trace is None:
+                trace = Trace(scan_id, profile=self.profile, interval=self.interval)
+            self._traces[scan_id] = (trace, refs + 1)
+            return trace
+
+    def get(self, scan_id: str) -> Optional[Trace]:
+        entry = self._traces.get(scan_id)
+        return entry[0] if entry else None
+
+    def finish(self, scan_id: str) -> Optional[Trace]:
+        """Release a reference; returns the (closed) trace when it was the last one"""
+        with self._lock:
+            entry = self._traces.get(scan_id)
+            if entry is None:
+                return None
+            trace, refs = entry
+            if refs > 1:
+                self._traces[scan_id] = (trace, refs - 1)
+                return None
+            del self._traces[scan_id]
+        trace.close()
+        return trace
+
+    @contextmanager
+    def session(self, scan_id: str, on_finish: Callable[[str, Trace], None]):
+        """start() for the block; on_finish(scan_id, trace) runs if it released the last reference"""
+        self.start(scan_id)
+        try:
+            yield
+        finally:
+            trace = self.finish(scan_id)
+            if trace is not None:
+                on_finish(scan_id, trace)
+
+    @contextmanager
+    def span(self, scan_id: str, name: str, cat: str = "stage", **args):
+        trace = self.get(scan_id)
+        if trace is None:
+            yield args
+            return
+        with trace.span(name, cat, **args) as span_args:
+            yield span_args
+
+    def add(self, scan_id: str, name: str, start: float, end: float, cat: str = "stage", **args):
+        trace = self.get(scan_id)
+        if trace is not None:
+            trace.add(name, start, end, cat, **args)
+
+def chrome_trace(scan_id: str, events: List[Dict[str, Any]], **other) -> Dict[str, Any]:
+    """Chrome trace file (chrome://tracing, Perfetto, speedscope)"""
+    return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"scan_id": scan_id, **other}}
+
+if __name__ == "__main__":
+    # Test run
+    # tracer = Tracer(); tracer.start("demo")
+    # with tracer.span("demo", "stage"): time.sleep(0.1)
+    # print(chrome_trace("demo", tracer.finish("demo").chrome_events()))
+    pass
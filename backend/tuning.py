@@ -0,0 +1,101 @@
+import os
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))  # respects container/taskset limits
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def available_memory_mb() -> int:
+    """MemAvailable from /proc/meminfo, falling back to free physical pages"""
+    try:
+        with open("/proc/meminfo", 'r') as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return 2048
+
+def clamp(value: float, low: int, high: int) -> int:
+    return int(max(low, min(high, value)))
+
+class ResourceTuner:
+    """
+    Parallelism flags for Katana (-c/-p) and Nuclei (-c/-bs/-hbs).
+    - Derived from available CPUs, available memory and the number of scans running now.
+    - Each active scan gets an equal share, so concurrent scans don't oversubscribe the host.
+    - SNL_TUNER_CPUS / SNL_TUNER_MEMORY_MB override detection; SNL_AUTOTUNE=0 keeps tool defaults.
+    """
+
+    # Rough per-unit costs used to keep flags within the memory share of a scan
+    NUCLEI_MB_PER_REQUEST = 0.5      # one in-flight template x host request
+    HEADLESS_MB_PER_BROWSER = 250    # one headless Chrome page
+    KATANA_MB_PER_FETCHER = 8
+
+    def __init__(self):
+        self.enabled = os.getenv("SNL_AUTOTUNE", "1") != "0"
+        self.cpus_override = int(os.getenv("SNL_TUNER_CPUS", "0"))
+        self.memory_override = int(os.getenv("SNL_TUNER_MEMORY_MB", "0"))
+        self._active = 0
+        self._lock = threading.Lock()
+
+    @property
+    def active_scans(self) -> int:
+        return self._active
+
+    @contextmanager
+    def scan_slot(self, count: int = 1):
+        """Count scans as active while the block runs"""
+        with self._lock:
+            self._active += count
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= count
+
+    def resources(self) -> Dict[str, int]:
+        return {
+            "cpus": self.cpus_override or available_cpus(),
+            "memory_mb": self.memory_override or available_memory_mb(),
+            "active_scans": max(1, self._active)
+        }
+
+    def katana_flags(self) -> Dict[str, Any]:
+        """{"c": fetchers per crawl, "p": inputs crawled in parallel}, or {} when disabled"""
+        if not self.enabled:
+            return {}
+        r = self.resources()
+        cpu_share = r["cpus"] / r["active_scans"]
+        mem_share = r["memory_mb"] / r["active_scans"]
+        concurrency = clamp(min(cpu_share * 5, mem_share * 0.25 / self.KATANA_MB_PER_FETCHER), 2, 50)
+        parallelism = clamp(cpu_share, 1, 10)
+        return {"c": concurrency, "p": parallelism}
+
+    def nuclei_flags(self) -> Dict[str, Any]:
+        """{"c": templates in parallel, "bs": hosts per template, "hbs": headless hosts}, or {} when disabled"""
+        if not self.enabled:
+            return {}
+        r = self.resources()
+        cpu_share = r["cpus"] / r["active_scans"]
+        mem_share = r["memory_mb"] / r["active_scans"]
+
+        # Requests in flight are roughly c x bs: scale both with CPU, then fit into half the memory share
+        concurrency = clamp(cpu_share * 6, 5, 50)
+        bulk_size = clamp(cpu_share * 6, 5, 50)
+        while concurrency * bulk_size * self.NUCLEI_MB_PER_REQUEST > mem_share * 0.5 and (concurrency > 5 or bulk_size > 5):
+            concurrency = max(5, concurrency - 5)
+            bulk_size = max(5, bulk_size - 5)
+        headless_bulk_size = clamp(mem_share * 0.25 / self.HEADLESS_MB_PER_BROWSER, 1, 10)
+        return {"c": concurrency, "bs": bulk_size, "hbs": headless_bulk_size}
@@ -47,6 +47,9 @@ function App() {
 
   // History state
   const [scanHistory, setScanHistory] = useState([]);
+  const [historyCursor, setHistoryCursor] = useState(null);
+  const [historyTotals, setHistoryTotals] = useState(null);
+  const [historyFilters, setHistoryFilters] = useState({ status: 'all', q: '' });
 
   // URL validation state
   const [urlError, setUrlError] = useState(null);
@@ -58,6 +61,9 @@ function App() {
   // Refs for intervals (to allow stopping)
   const pollIntervalRef = useRef(null);
   const progressIntervalRef = useRef(null);
+  // Read by loadScanHistory, which also runs from stale polling closures
+  const historyFiltersRef = useRef(historyFilters);
+  const historyLoadedRef = useRef(0);
 
   // Theme effect
   useEffect(() => {
@@ -90,18 +96,68 @@ function App() {
     }
   }, [session]);
 
-  const loadScanHistory = async () => {
+  useEffect(() => {
+    historyLoadedRef.current = scanHistory.length;
+  }, [scanHistory]);
+
+  // Totals on the dashboard are unfiltered, so don't leave its recent list filtered
+  useEffect(() => {
+    if (currentView === 'dashboard' && (historyFilters.status !== 'all' || historyFilters.q)) {
+      handleHistoryFiltersChange({ status: 'all', q: '' });
+    }
+  }, [currentView]);
+
+  // refresh: reload the first page but keep any further pages already loaded
+  const loadScanHistory = async (cursor = null, refresh = false) => {
     if (!session) return;
+    const { status, q } = historyFiltersRef.current;
+    const params = {};
+    if (cursor) params.cursor = cursor;
+    if (status !== 'all') params.status = status;
+    if (q) params.q = q;
     try {
       const response = await axios.get(`${API_BASE}/scans`, {
+        params,
         headers: { Authorization: `Bearer ${session.access_token}` }
       });
-      setScanHistory(response.data || []);
+      const items = response.data?.items || [];
+      setHistoryTotals(response.data?.totals || null);
+      if (refresh && historyLoadedRef.current > items.length) {
+        setScanHistory(prev => {
+          const fresh = new Set(items.map(s => s.scan_id));
+          return [...items, ...prev.filter(s => !fresh.has(s.scan_id))];
+        });
+      } else {
+        setScanHistory(prev => (cursor ? [...prev, ...items] : items));
+        setHistoryCursor(response.data?.next_cursor || null);
+      }
     } catch (err) {
       console.log('Could not load scan history:', err.message);
     }
   };
 
+  const handleHistoryFiltersChange = (filters) => {
+    historyFiltersRef.current = filters;
+    setHistoryFilters(filters);
+    loadScanHistory();
+  };
+
+  const handleViewResult = async (scan) => {
+    if (scan.status !== 'completed') return;
+    try {
+      const response = await axios.get(`${API_BASE}/scan/${scan.scan_id}`, {
+        headers: { Authorization: `Bearer ${session.access_token}` }
+      });
+      if (response.data.result) {
+        setResult(response.data.result);
+        setCurrentScanId(scan.scan_id);
+        setCurrentView('scanner');
+      }
+    } catch (err) {
+      console.log('Failed to load scan result:', err.message);
+    }
+  };
+
   const simulateStepProgress = () => {
     const steps = ['discovery', 'detection', 'analysis', 'report'];
     let stepIndex = 0;
@@ -118,7 +174,7 @@ function App() {
     return interval;
   };
 
-  const handleScan = async (e) => {
+  const handleScan = async (e, force = false) => {
     if (e) e.preventDefault();
     if (!url) return;
 
@@ -146,7 +202,8 @@ function App() {
       // Start the scan
       const startResponse = await axios.post(`${API_BASE}/scan`, {
         url,
-        mode: scanMode
+        mode: scanMode,
+        force
       }, {
         headers: { Authorization: `Bearer ${session.access_token}` }
       });
@@ -156,18 +213,26 @@ function App() {
       // Poll for results
       pollIntervalRef.current = setInterval(async () => {
         try {
+          // Status-only poll; the full result is fetched once the scan completes
           const statusResponse = await axios.get(`${API_BASE}/scan/${scan_id}`, {
+            params: { fields: 'status,error' },
             headers: { Authorization: `Bearer ${session.access_token}` }
           });
-          const { status, result: scanResult, error: scanError } = statusResponse.data;
+          const { status, error: scanError } = statusResponse.data;
 
           if (status === 'completed') {
             clearInterval(pollIntervalRef.current);
             clearInterval(progressIntervalRef.current);
+            const resultResponse = await axios.get(`${API_BASE}/scan/${scan_id}`, {
+              headers: { Authorization: `Bearer ${session.access_token}` }
+            });
             setCurrentStep('report');
-            setResult(scanResult);
+            setResult(resultResponse.data.result);
             setLoading(false);
-            loadScanHistory(); // Refresh history
+            loadScanHistory(null, true); // Refresh history
+            if (resultResponse.data.ai_enrichment === 'pending') {
+              refreshWhenEnriched(scan_id, resultResponse.data.result);
+            }
           } else if (status === 'failed' || status === 'cancelled') {
             clearInterval(pollIntervalRef.current);
             clearInterval(progressIntervalRef.current);
@@ -189,6 +254,28 @@ function App() {
     }
   };
 
+  // The report is served with offline remediation text first; pick up the AI version once it lands
+  const refreshWhenEnriched = (scan_id, shown, attempts = 20) => {
+    setTimeout(async () => {
+      try {
+        const headers = { Authorization: `Bearer ${session.access_token}` };
+        const { data } = await axios.get(`${API_BASE}/scan/${scan_id}`, {
+          params: { fields: 'ai_enrichment' },
+          headers
+        });
+        if (data.ai_enrichment === 'completed') {
+          const resultResponse = await axios.get(`${API_BASE}/scan/${scan_id}`, { headers });
+          // Only swap if the user is still looking at this report
+          setResult((current) => (current === shown ? resultResponse.data.result : current));
+        } else if (data.ai_enrichment === 'pending' && attempts > 1) {
+          refreshWhenEnriched(scan_id, shown, attempts - 1);
+        }
+      } catch (err) {
+        console.log('Failed to refresh AI interpretation:', err.message);
+      }
+    }, 3000);
+  };
+
   const handleStopScan = async () => {
     if (!currentScanId || !session) return;
 
@@ -200,7 +287,7 @@ function App() {
       clearInterval(progressIntervalRef.current);
       setLoading(false);
       setError('Scan was stopped by user.');
-      loadScanHistory();
+      loadScanHistory(null, true);
     } catch (err) {
       console.log('Failed to stop scan:', err.message);
     }
@@ -211,14 +298,17 @@ function App() {
     setCurrentView('scanner');
     // Auto-start scan after short delay
     setTimeout(() => {
-      handleScan();
+      handleScan(null, true); // a rescan must not reuse a recent identical scan
     }, 100);
   };
 
   const handleDeleteScan = async (scanId) => {
     try {
-      await axios.delete(`${API_BASE}/scan/${scanId}`);
-      loadScanHistory();
+      await axios.delete(`${API_BASE}/scan/${scanId}`, {
+        headers: { Authorization: `Bearer ${session.access_token}` }
+      });
+      setScanHistory(prev => prev.filter(s => s.scan_id !== scanId));
+      loadScanHistory(null, true);
     } catch (err) {
       console.log('Failed to delete scan:', err.message);
     }
@@ -250,6 +340,7 @@ function App() {
         return (
           <Dashboard
             scanHistory={scanHistory}
+            totals={historyTotals}
             onStartScan={() => setCurrentView('scanner')}
           />
         );
@@ -258,15 +349,13 @@ function App() {
         return (
           <ScanHistory
             scans={scanHistory}
+            filters={historyFilters}
+            onFiltersChange={handleHistoryFiltersChange}
             onRescan={handleRescan}
             onDelete={handleDeleteScan}
-            onViewResult={(scan) => {
-              if (scan.result) {
-                setResult(scan.result);
-                setCurrentScanId(scan.scan_id);
-                setCurrentView('scanner');
-              }
-            }}
+            onViewResult={handleViewResult}
+            hasMore={!!historyCursor}
+            onLoadMore={() => loadScanHistory(historyCursor)}
           />
         );
 
@@ -497,6 +586,11 @@ function App() {
               >
                 <p className="text-sm text-gray-400 mb-1">Scan Duration</p>
                 <p className="text-2xl font-bold">{result.summary.duration_seconds}s</p>
+                {result.summary.partial && (
+                  <p className="text-xs text-warning mt-1" title={`Cut short: ${(result.summary.partial_stages || []).join(', ')}`}>
+                    Partial results (deadline reached)
+                  </p>
+                )}
               </motion.div>
             </div>
 
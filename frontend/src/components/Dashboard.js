@@ -11,15 +11,12 @@ import {
     ExternalLink
 } from 'lucide-react';
 
-function Dashboard({ scanHistory, onStartScan, stats }) {
-    const totalScans = scanHistory?.length || 0;
-    const completedScans = scanHistory?.filter(s => s.status === 'completed').length || 0;
-    const totalVulns = scanHistory?.reduce((acc, scan) => {
-        return acc + (scan.result?.summary?.top_issues_count || 0);
-    }, 0) || 0;
-    const avgDuration = scanHistory?.length
-        ? (scanHistory.reduce((acc, s) => acc + (s.result?.summary?.duration_seconds || 0), 0) / scanHistory.length).toFixed(1)
-        : 0;
+function Dashboard({ scanHistory, totals, onStartScan, stats }) {
+    // totals come from GET /scans and cover every scan, not just the loaded page
+    const totalScans = totals?.scans || 0;
+    const completedScans = totals?.completed || 0;
+    const totalVulns = totals?.issues || 0;
+    const avgDuration = totals?.avg_duration_seconds ?? 0;
 
     const statCards = [
         {
@@ -27,14 +24,14 @@ function Dashboard({ scanHistory, onStartScan, stats }) {
             value: totalScans,
             icon: Target,
             color: 'from-blue-500 to-cyan-400',
-            change: '+3 this week'
+            change: 'All time'
         },
         {
             label: 'Vulnerabilities Found',
             value: totalVulns,
             icon: Bug,
             color: 'from-red-500 to-orange-400',
-            change: 'Across all scans'
+            change: 'Across completed scans'
         },
         {
             label: 'Success Rate',
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
 import {
     History,
@@ -13,16 +13,21 @@ import {
     AlertCircle
 } from 'lucide-react';
 
-function ScanHistory({ scans, onRescan, onDelete, onViewResult }) {
-    const [searchQuery, setSearchQuery] = useState('');
-    const [statusFilter, setStatusFilter] = useState('all');
+function ScanHistory({ scans, filters, onFiltersChange, onRescan, onDelete, onViewResult, hasMore, onLoadMore }) {
+    const [searchQuery, setSearchQuery] = useState(filters?.q || '');
     const [showFilters, setShowFilters] = useState(false);
+    const statusFilter = filters?.status || 'all';
 
-    const filteredScans = scans?.filter(scan => {
-        const matchesSearch = scan.target?.toLowerCase().includes(searchQuery.toLowerCase());
-        const matchesStatus = statusFilter === 'all' || scan.status === statusFilter;
-        return matchesSearch && matchesStatus;
-    }) || [];
+    // Search and status filtering run on the server so they cover unloaded pages too
+    useEffect(() => {
+        if (searchQuery === (filters?.q || '')) return;
+        const timer = setTimeout(() => onFiltersChange({ status: statusFilter, q: searchQuery }), 300);
+        return () => clearTimeout(timer);
+    }, [searchQuery]);
+
+    const setStatusFilter = (status) => onFiltersChange({ status, q: searchQuery });
+
+    const filteredScans = scans || [];
 
     const getStatusBadge = (status) => {
         switch (status) {
@@ -165,16 +170,16 @@ function ScanHistory({ scans, onRescan, onDelete, onViewResult }) {
                                             </span>
                                         </td>
                                         <td>
-                                            <span className={`font-semibold ${(scan.result?.summary?.top_issues_count || 0) > 0
+                                            <span className={`font-semibold ${(scan.summary?.top_issues_count || 0) > 0
                                                     ? 'text-danger'
                                                     : 'text-success'
                                                 }`}>
-                                                {scan.result?.summary?.top_issues_count || 0}
+                                                {scan.summary?.top_issues_count || 0}
                                             </span>
                                         </td>
                                         <td className="text-gray-400">
-                                            {scan.result?.summary?.duration_seconds
-                                                ? `${scan.result.summary.duration_seconds}s`
+                                            {scan.summary?.duration_seconds
+                                                ? `${scan.summary.duration_seconds}s`
                                                 : '-'}
                                         </td>
                                         <td className="text-gray-400">
@@ -250,11 +255,16 @@ function ScanHistory({ scans, onRescan, onDelete, onViewResult }) {
                     transition={{ delay: 0.4 }}
                 >
                     <span>
-                        Showing {filteredScans.length} of {scans?.length || 0} scans
+                        Showing {filteredScans.length} scans
                     </span>
+                    {hasMore && (
+                        <button onClick={onLoadMore} className="btn-secondary">
+                            Load more
+                        </button>
+                    )}
                     <span>
-                        Total vulnerabilities found: {
-                            filteredScans.reduce((acc, s) => acc + (s.result?.summary?.top_issues_count || 0), 0)
+                        Vulnerabilities in these scans: {
+                            filteredScans.reduce((acc, s) => acc + (s.summary?.top_issues_count || 0), 0)
                         }
                     </span>
                 </motion.div>